@@ -3,8 +3,35 @@ import pandas as pd
 import folium
 from folium import plugins
 from streamlit_folium import st_folium
+import numpy as np
 import re
 import math
+import os
+import io
+import json
+import hashlib
+import tempfile
+import html
+import threading
+import time
+import itertools
+import unicodedata
+import base64
+import urllib.request
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    from pyarrow import feather
+except ImportError:  # no on-disk listings cache without pyarrow
+    pa = pc = feather = None
+
+try:
+    from PIL import Image
+except ImportError:  # no thumbnail cache without Pillow; cards link the CDN photos
+    Image = None
 
 # Page config
 st.set_page_config(
@@ -57,6 +84,96 @@ st.markdown("""
         box-shadow: 0 2px 12px rgba(0,0,0,0.08);
         margin-bottom: 15px;
     }
+    .property-card {
+        display: grid;
+        grid-template-columns: 1fr 2fr 1fr;
+        gap: 20px;
+        background: white;
+        border-radius: 12px;
+        padding: 20px;
+        margin-bottom: 20px;
+        box-shadow: 0 4px 12px rgba(0,0,0,0.08);
+        transition: transform 0.2s, box-shadow 0.2s;
+    }
+    .property-card:hover {
+        transform: translateY(-4px);
+        box-shadow: 0 8px 24px rgba(0,0,0,0.12);
+    }
+    .property-card img, .property-placeholder {
+        width: 100%;
+        height: 200px;
+        object-fit: cover;
+        border-radius: 12px;
+    }
+    .property-placeholder {
+        background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
+        display: flex;
+        align-items: center;
+        justify-content: center;
+        color: white;
+        font-size: 48px;
+    }
+    .property-title {
+        color: #1e40af;
+        font-size: 20px;
+        font-weight: 600;
+        margin-bottom: 8px;
+        text-decoration: none;
+        display: block;
+    }
+    .property-location {
+        color: #6b7280;
+        font-size: 14px;
+        margin-bottom: 12px;
+    }
+    .property-details {
+        display: flex;
+        gap: 16px;
+        font-weight: 700;
+        margin-bottom: 8px;
+    }
+    .property-price {
+        color: #7c3aed;
+        font-size: 32px;
+        font-weight: 700;
+    }
+    .property-caption {
+        color: #6b7280;
+        font-size: 14px;
+        margin-bottom: 8px;
+    }
+    .property-features {
+        display: inline-block;
+        background: #dbeafe;
+        color: #1e40af;
+        padding: 4px 12px;
+        border-radius: 16px;
+        font-size: 12px;
+        margin: 4px 4px 4px 0;
+    }
+    .property-gallery {
+        display: flex;
+        gap: 6px;
+        overflow-x: auto;
+        scroll-snap-type: x mandatory;
+        margin-top: 8px;
+    }
+    .property-card .property-gallery img {
+        flex: none;
+        width: auto;
+        height: 120px;
+        border-radius: 6px;
+        scroll-snap-align: start;
+    }
+    .property-link {
+        display: block;
+        text-align: center;
+        padding: 8px;
+        margin-top: 8px;
+        border: 1px solid #d1d5db;
+        border-radius: 8px;
+        text-decoration: none;
+    }
 </style>
 """, unsafe_allow_html=True)
 
@@ -98,6 +215,7 @@ TRANSLATIONS = {
         'location': 'Байршил',
         'features': 'Онцлог',
         'description': 'Тайлбар',
+        'photos': 'зураг',
         'view_on': 'unegui.mn дээр харах',
         'date': 'Огноо',
         'views': 'үзсэн',
@@ -122,7 +240,59 @@ TRANSLATIONS = {
         'mortgage_budget_low': 'Таны сарын төлбөр бага байна. Доорх хугацаа нь хүүг тооцоогүй ойролцоо тооцоо юм.',
         'mortgage_result_time': '🏦 Төлбөр дуусах хугацаа',
         'mortgage_result_total': '💰 Нийт төлөх дүн (урьдчилгаа оруулаад)',
-        'mortgage_hint': '➡️ Сонгосон зарыг хараад үнийг энд хуулж тавиад ипотекийн хугацаагаа тооцоолно уу.'
+        'mortgage_hint': '➡️ Сонгосон зарыг хараад үнийг энд хуулж тавиад ипотекийн хугацаагаа тооцоолно уу.',
+        'mortgage_years': 'Төлж дуусгах хугацаа (жил)',
+        'mortgage_result_payment': '📆 {years} жилд төлж дуусгах сарын төлбөр',
+        'mortgage_affordable_only': 'Зөвхөн энэ хугацаанд төлж дуусгах боломжтой зарууд',
+        'mortgage_affordable_count': '{count} / {total} зарыг таны төлбөрөөр {years} жилд төлж дуусгах боломжтой',
+        'mortgage_schedule': '📑 Эргэн төлөлтийн хуваарь',
+        'mortgage_schedule_year': 'Жил',
+        'mortgage_schedule_month': 'Сар',
+        'mortgage_schedule_payment': 'Төлбөр',
+        'mortgage_schedule_interest': 'Хүү',
+        'mortgage_schedule_principal': 'Үндсэн зээл',
+        'mortgage_schedule_balance': 'Үлдэгдэл',
+        'mortgage_sweep': '📊 Хувилбаруудын хүснэгт',
+        'mortgage_sweep_help': 'Хүү, урьдчилгаа, сарын төлбөрийн олон хослолоор энэ үнийн төлж дуусах хугацааг харьцуулна',
+        'mortgage_sweep_steps': 'Алхамын тоо',
+        'mortgage_sweep_budget': 'Харуулах сарын төлбөр',
+        'mortgage_sweep_caption': 'Төлж дуусах хугацаа (жил): мөр нь хүү, багана нь урьдчилгаа. — нь тухайн төлбөрөөр зээл хэзээ ч дуусахгүй гэсэн үг.',
+        'filter_debug': '🐞 Шүүлтүүрийн сонголт',
+        'filter_name': 'Шүүлтүүр',
+        'filter_keeps': 'Үлдэх хувь',
+        'map_viewport': 'Зөвхөн харагдаж буй хэсгийг ачаалах',
+        'map_viewport_help': 'Газрын зургийн харагдаж буй хэсэгт байгаа зарыг тэмдэглэгээгээр, бусдыг дүүргээр нэгтгэн харуулна',
+        'map_zoom_in': 'Энэ хэсэгт {count} зар байна — дэлгэрэнгүй харахын тулд томруулна уу',
+        'popup_details_below': 'Дэлгэрэнгүй мэдээлэл газрын зургийн доор',
+        'map_layer': 'Давхарга',
+        'map_layer_markers': 'Зарууд',
+        'map_layer_heatmap': 'м²-ийн үнийн дулааны зураг',
+        'map_layer_districts': 'Дүүргийн дундаж үнэ',
+        'cache_debug': '🐞 Кэш',
+        'cache_name': 'Кэш',
+        'cache_entries': 'Бичлэг',
+        'cache_hits': 'Олдсон',
+        'cache_misses': 'Олдоогүй',
+        'memory_per_listing': 'Нэг зарын санах ой',
+        'extract_rate': 'Тайлбараас уншсан: {parsed} шинээр, {cached} кэшээс; нэг цөмд {rate:,.0f} мөр/с',
+        'sort_by': 'Эрэмбэлэх',
+        'sort_default': 'Анхны дараалал',
+        'sort_price_asc': 'Үнэ: багаас их',
+        'sort_price_desc': 'Үнэ: ихээс бага',
+        'sort_price_m2_asc': 'м²-ийн үнэ: багаас их',
+        'sort_area_desc': 'Талбай: томоос жижиг',
+        'sort_year_desc': 'Шинэ барилга эхэнд',
+        'sort_views_desc': 'Их үзэлттэй нь эхэнд',
+        'sort_relevance': 'Хайлтад хамгийн тохирох',
+        'analytics_title': '📈 Үнийн шинжилгээ',
+        'analytics_group_by': 'Бүлэглэх',
+        'analytics_p25': 'Доод 25%',
+        'analytics_p75': 'Дээд 25%',
+        'analytics_median_m2': 'м²-ийн дунд үнэ',
+        'analytics_from_cube': 'Урьдчилан нэгтгэсэн {count} нүднээс тооцов (хувь ±1%)',
+        'analytics_from_rows': 'Шүүлтүүр нэгтгэлийн хэмжээсүүдээс гадуур тул сонгосон зарнаас тооцов (хувь ±1%)',
+        'search': '🔎 Хайх',
+        'search_placeholder': 'Гарчиг, тайлбараас (жишээ нь: зайсан 2 өрөө)',
     },
     'en': {
         'title': '🏠 Ulaanbaatar Real Estate Map',
@@ -156,6 +326,7 @@ TRANSLATIONS = {
         'location': 'Location',
         'features': 'Features',
         'description': 'Description',
+        'photos': 'photos',
         'view_on': 'View on unegui.mn',
         'date': 'Date',
         'views': 'views',
@@ -180,7 +351,59 @@ TRANSLATIONS = {
         'mortgage_budget_low': 'Your monthly budget is very low; the estimate below ignores interest and is only approximate.',
         'mortgage_result_time': '🏦 Payoff time',
         'mortgage_result_total': '💰 Total paid (including down payment)',
-        'mortgage_hint': '➡️ Choose a listing, copy its price here and calculate your mortgage duration.'
+        'mortgage_hint': '➡️ Choose a listing, copy its price here and calculate your mortgage duration.',
+        'mortgage_years': 'Pay off within (years)',
+        'mortgage_result_payment': '📆 Monthly payment to pay off in {years} years',
+        'mortgage_affordable_only': 'Only listings I can pay off within this time',
+        'mortgage_affordable_count': '{count} of {total} listings can be paid off within {years} years on your budget',
+        'mortgage_schedule': '📑 Amortization schedule',
+        'mortgage_schedule_year': 'Year',
+        'mortgage_schedule_month': 'Month',
+        'mortgage_schedule_payment': 'Payment',
+        'mortgage_schedule_interest': 'Interest',
+        'mortgage_schedule_principal': 'Principal',
+        'mortgage_schedule_balance': 'Balance',
+        'mortgage_sweep': '📊 Scenario grid',
+        'mortgage_sweep_help': 'Compare the payoff time of this price over many rate, down payment and budget combinations',
+        'mortgage_sweep_steps': 'Steps',
+        'mortgage_sweep_budget': 'Monthly budget shown',
+        'mortgage_sweep_caption': 'Years to pay off: rows are interest rates, columns down payments. — means the budget never pays the loan off.',
+        'filter_debug': '🐞 Filter selectivity',
+        'filter_name': 'Filter',
+        'filter_keeps': 'Keeps',
+        'map_viewport': 'Load visible area only',
+        'map_viewport_help': 'Shows markers for listings in the visible part of the map and groups the rest by district',
+        'map_zoom_in': '{count} listings in view — zoom in to see individual markers',
+        'popup_details_below': 'Details are shown below the map',
+        'map_layer': 'Layer',
+        'map_layer_markers': 'Listings',
+        'map_layer_heatmap': 'Price per m² heatmap',
+        'map_layer_districts': 'District median price',
+        'cache_debug': '🐞 Caches',
+        'cache_name': 'Cache',
+        'cache_entries': 'Entries',
+        'cache_hits': 'Hits',
+        'cache_misses': 'Misses',
+        'memory_per_listing': 'Memory per listing',
+        'extract_rate': 'Descriptions parsed: {parsed} new, {cached} cached; {rate:,.0f} rows/s on one core',
+        'sort_by': 'Sort by',
+        'sort_default': 'Original order',
+        'sort_price_asc': 'Price: low to high',
+        'sort_price_desc': 'Price: high to low',
+        'sort_price_m2_asc': 'Price per m²: low to high',
+        'sort_area_desc': 'Area: largest first',
+        'sort_year_desc': 'Newest building first',
+        'sort_views_desc': 'Most viewed first',
+        'sort_relevance': 'Best match',
+        'analytics_title': '📈 Price Analytics',
+        'analytics_group_by': 'Group by',
+        'analytics_p25': 'Lower quartile',
+        'analytics_p75': 'Upper quartile',
+        'analytics_median_m2': 'Median price per m²',
+        'analytics_from_cube': 'Combined from {count} pre-aggregated cells (quantiles within ±1%)',
+        'analytics_from_rows': 'Filters outside the cube dimensions: aggregated from the selected listings (quantiles within ±1%)',
+        'search': '🔎 Search',
+        'search_placeholder': 'Titles and descriptions (e.g. zaisan 2 oroo)',
     }
 }
 
@@ -198,184 +421,866 @@ with col2:
         st.session_state.language = 'en' if st.session_state.language == 'mn' else 'mn'
         st.rerun()
 
-@st.cache_data
+DATA_FILE = 'unegui_data.csv'
+CACHE_DIR = '.unegui_cache'
+# bump whenever process_listings changes its output so old caches are not reused
+CACHE_VERSION = 10
+# cards and popups show this much of a description
+DESCRIPTION_DISPLAY_CHARS = 300
+# 'full' reads the data file in one go. 'stream' reads INGEST_CHUNK_ROWS rows
+# at a time, only the columns process_listings uses, and parses each chunk
+# before reading the next, so peak memory follows the chunk size instead of
+# the file size
+INGEST_MODE = os.environ.get('UNEGUI_INGEST_MODE', 'full')
+INGEST_CHUNK_ROWS = int(os.environ.get('UNEGUI_INGEST_CHUNK_ROWS', '20000'))
+
+# cache_resource: one shared, read-only frame instead of a copy per cache hit
+@st.cache_resource
 def load_unegui_data():
     """Load and process the scraped unegui.mn data"""
+    try:
+        source = source_signature(DATA_FILE)
+    except OSError:
+        return finalize_listings(None)
+
+    fingerprint = cache_fingerprint(source)
+    store = read_listings_store(_cache_path(fingerprint))
+    extractions = None
+    if store is None:
+        extractions = read_extraction_cache()
+        try:
+            store = update_listings_store(
+                DATA_FILE, source, read_latest_listings_store(),
+                chunk_rows=INGEST_CHUNK_ROWS if INGEST_MODE == 'stream' else None,
+                extractions=extractions
+            )
+        except Exception:
+            return finalize_listings(None)
+        write_listings_store(fingerprint, store)
+        write_extraction_cache(extractions, store['listings']['id'])
+
+    listings = finalize_listings(store['listings'])
+    if extractions is not None:
+        # description parsing throughput, shown with the caches
+        listings.attrs['extraction'] = extractions['stats']
+    # names the search index persisted for this data
+    listings.attrs['fingerprint'] = fingerprint
+    return listings
+
+def source_signature(path):
+    """Size, mtime and content hash of a data file"""
+    stat = os.stat(path)
+    return {
+        'size': stat.st_size,
+        'mtime_ns': stat.st_mtime_ns,
+        'sha256': _sha256_prefix(path, stat.st_size)
+    }
+
+def cache_fingerprint(source):
+    key = f"{CACHE_VERSION}:{source['size']}:{source['mtime_ns']}:{source['sha256']}"
+    return hashlib.sha256(key.encode()).hexdigest()[:24]
+
+def _sha256_prefix(path, size):
+    digest = hashlib.sha256()
+    remaining = size
+    with open(path, 'rb') as f:
+        while remaining > 0:
+            chunk = f.read(min(1 << 20, remaining))
+            if not chunk:
+                break
+            digest.update(chunk)
+            remaining -= len(chunk)
+    return digest.hexdigest()
+
+# raw columns process_listings reads (any of the alternative names)
+SOURCE_COLUMNS = [
+    'Title', 'Title(0)', 'Price', 'Price(0)', 'Area', 'Ad_Number', 'images', 'Image',
+    'Location', 'Place', 'Location Detail', 'Balcony', 'Elevator', 'Garage',
+    'Commissioning Year', 'Year', 'Window Count', 'Window_Count', 'Window', 'Room Count', 'Rooms',
+    'Floor Number', 'Floor_Number', 'Building Floor', 'Building_Floor', 'Door Type', 'Door',
+    'Floor Type', 'Floor_Type', 'Floor', 'Description', 'Published Date', 'Date',
+    'View Count', 'View_Count', 'Title link', 'Title_Link', 'Link'
+]
 
-    def clean_date_text(val):
-        """Remove 'unuudur/өнөөдөр' etc from date text"""
-        if val is None or val == 'nan' or pd.isna(val):
-            return ''
-        s = str(val)
-        for w in ['Өнөөдөр', 'өнөөдөр', 'unuudur', 'unuudur']:
-            s = s.replace(w, '')
-        return s.strip()
+def read_scrape_csv(source):
+    # every column as text, so a chunk of the file parses exactly like the whole file
+    return pd.read_csv(source, dtype=str)
 
-    try:
-        df = pd.read_csv('unegui_data.csv')
-    except Exception:
+def read_scrape_rows(path, offset=0, first_row=0, chunk_rows=None):
+    """Raw rows of the data file from byte offset on (0 or a line start), indexed
+    by row number from first_row.
+
+    Yields one frame, or with chunk_rows frames of that many rows holding only
+    SOURCE_COLUMNS (still all text, see read_scrape_csv).
+    """
+    with open(path, 'rb') as f:
+        header = f.readline()
+        if chunk_rows is None:
+            if offset:
+                f.seek(offset)
+                raw = read_scrape_csv(io.BytesIO(header + f.read()))
+            else:
+                raw = read_scrape_csv(path)
+            raw.index += first_row
+            yield raw
+            return
+        if offset:
+            f.seek(offset)
+        names = read_scrape_csv(io.BytesIO(header)).columns
+        chunks = pd.read_csv(
+            f, header=None, names=names, usecols=lambda name: name in SOURCE_COLUMNS,
+            dtype=str, chunksize=chunk_rows
+        )
+        for raw in chunks:
+            raw.index += first_row
+            yield raw
+
+def update_listings_store(path, source, previous=None, chunk_rows=None, extractions=None):
+    """Bring the listings store up to date with the data file at path.
+
+    When the file only grew since ``previous`` was built (new scrape pages
+    appended), just the appended rows are read and parsed. Otherwise every row
+    is hashed and only rows that were never seen before are parsed; stored rows
+    whose raw line disappeared are dropped.
+
+    With chunk_rows the rows are streamed (see read_scrape_rows) and each chunk
+    is parsed and compacted before the next one is read. extractions is passed
+    on to process_listings.
+    """
+    appended = previous is not None and _is_append(path, previous)
+    if appended:
+        chunks = read_scrape_rows(path, previous['source_size'], previous['row_count'], chunk_rows)
+        row_count = previous['row_count']
+    else:
+        chunks = read_scrape_rows(path, chunk_rows=chunk_rows)
+        row_count = 0
+    if previous is None:
+        listings = _empty_store()
+        rejected = np.empty(0, dtype='uint64')
+    else:
+        listings = previous['listings']
+        rejected = previous['rejected']
+
+    batches, new_rejected, row_numbers = [], [], []
+    for raw in chunks:
+        if len(raw):
+            row_count = int(raw.index.max()) + 1
+        hashes = raw_row_hashes(raw)
+        if previous is not None and not appended:
+            row_numbers.append(pd.Series(raw.index, index=hashes))
+            unseen = ~hashes.isin(listings['row_hash']) & ~hashes.isin(rejected)
+            raw, hashes = raw[unseen], hashes[unseen]
+        batch = process_listings(raw, extractions)
+        new_rejected.append(hashes[~hashes.isin(batch['row_hash'])].to_numpy())
+        batches.append(batch if chunk_rows is None else compact_listings(batch))
+
+    if previous is not None and not appended:
+        row_numbers = pd.concat(row_numbers) if row_numbers else pd.Series(dtype='int64')
+        listings = listings[listings['row_hash'].isin(row_numbers.index)]
+        # unchanged rows may have moved within the rewritten file
+        row_numbers = row_numbers[~row_numbers.index.duplicated(keep='last')]
+        listings = listings.assign(row_number=row_numbers.reindex(listings['row_hash']).to_numpy())
+        rejected = rejected[np.isin(rejected, row_numbers.index)]
+    rejected = np.union1d(rejected, np.concatenate(new_rejected or [np.empty(0, dtype='uint64')]))
+    frames = [frame for frame in [listings, *batches] if len(frame)]
+    if len(frames) > 1:
+        listings = pd.concat(frames, ignore_index=True)
+        if chunk_rows is not None:
+            # chunks with different category sets concatenate to object columns
+            listings = compact_listings(listings)
+    elif frames:
+        listings = frames[0]
+    elif batches:
+        listings = batches[-1]
+
+    return {
+        'listings': listings.sort_values('row_number', kind='stable').reset_index(drop=True),
+        'rejected': rejected,
+        'source_size': source['size'],
+        'source_sha256': source['sha256'],
+        'row_count': row_count
+    }
+
+def _is_append(path, previous):
+    old_size = previous['source_size']
+    if os.path.getsize(path) <= old_size or old_size == 0:
+        return False
+    with open(path, 'rb') as f:
+        f.seek(old_size - 1)
+        # the old file must have ended on a complete line
+        if f.read(1) != b'\n':
+            return False
+    return _sha256_prefix(path, old_size) == previous['source_sha256']
+
+def _empty_store():
+    return process_listings(read_scrape_csv(io.StringIO('Title\n')))
+
+def finalize_listings(listings):
+    """Deduplicate stored listings by id (the latest row in the file wins)"""
+    if listings is None or len(listings) == 0:
         return pd.DataFrame(columns=[
             'id', 'title', 'price', 'district', 'area', 'balcony', 'elevator',
             'garage', 'year', 'window_count', 'door', 'floor_type', 'rooms'
         ])
+    listings = listings.drop_duplicates(subset=['id'], keep='last')
+    return compact_listings(listings.drop(columns=['row_number', 'row_hash']).reset_index(drop=True))
+
+# low-cardinality text columns, stored as pandas Categoricals
+CATEGORY_COLUMNS = [
+    'district', 'door', 'floor_type', 'elevator', 'garage', 'balcony',
+    'location', 'window_count', 'rooms', 'year'
+]
+# free text, kept in one Arrow buffer per column instead of a Python object per cell
+STRING_COLUMNS = [
+    'title', 'description', 'description_more', 'image_url', 'image_urls', 'link', 'price_formatted',
+    'date', 'views', 'floor', 'building_floor'
+]
+FLOAT32_COLUMNS = ['area', 'lat', 'lng', 'balcony_count']
 
-    processed = []
+def compact_listings(listings):
+    """Downcast the listings frame to its compact in-memory schema.
 
-    for idx, row in df.iterrows():
-        try:
-            area_str = str(row.get('Area', ''))
-            area_match = re.findall(r'[\d.]+', area_str)
-            area = float(area_match[0]) if area_match else 0
-            # drop 0 m2 and crazy outliers like 7248m2
-            if area == 0 or area > 1000:
-                continue
+    Prices stay float64 (float32 would round multi-billion prices by hundreds
+    of tugriks); areas and coordinates fit float32 (~1 m at Ulaanbaatar).
+    """
+    dtypes = {col: 'category' for col in CATEGORY_COLUMNS}
+    dtypes.update({col: 'float32' for col in FLOAT32_COLUMNS})
+    dtypes['khoroo'] = 'Int16'
+    if pa is not None:
+        dtypes.update({col: 'string[pyarrow]' for col in STRING_COLUMNS})
+    listings = listings.astype({col: dtype for col, dtype in dtypes.items() if col in listings.columns})
+    # rows dropped from an already compacted store leave unused categories behind
+    for col in CATEGORY_COLUMNS:
+        if col in listings.columns:
+            listings[col] = listings[col].cat.remove_unused_categories()
+    return listings
+
+def memory_report(listings):
+    """Bytes per listing for every column of the frame (deep, i.e. counting strings)"""
+    usage = listings.memory_usage(deep=True, index=False)
+    report = pd.DataFrame({
+        'dtype': listings.dtypes.astype(str),
+        'bytes_per_listing': usage / max(len(listings), 1)
+    })
+    report.loc['total'] = ['', report['bytes_per_listing'].sum()]
+    return report
+
+def raw_row_hashes(raw):
+    """Content hash of every raw CSV row over SOURCE_COLUMNS (the same whether
+    or not the row was read streaming); a changed row gets a new hash"""
+    raw = raw[[name for name in raw.columns if name in SOURCE_COLUMNS]]
+    return pd.Series(pd.util.hash_pandas_object(raw, index=False).to_numpy(), index=raw.index)
+
+def _cache_path(fingerprint):
+    return os.path.join(CACHE_DIR, f"listings-{fingerprint}.feather")
+
+def read_listings_store(path):
+    """Memory-map a cached listings store; None on a miss or an outdated file"""
+    if feather is None:
+        return None
+    try:
+        table = feather.read_table(path, memory_map=True)
+        meta = json.loads(table.schema.metadata[b'unegui'])
+        rejected = np.frombuffer(table.schema.metadata[b'unegui_rejected'], dtype='uint64')
+    except (OSError, KeyError, ValueError, pa.ArrowInvalid):
+        return None
+    if meta.get('version') != CACHE_VERSION:
+        return None
+    return {
+        'listings': table.to_pandas(),
+        'rejected': rejected,
+        'source_size': meta['source_size'],
+        'source_sha256': meta['source_sha256'],
+        'row_count': meta['row_count']
+    }
 
-            price_str = str(row.get('Price', '') or row.get('Price(0)', ''))
-            price_matches = re.findall(r'[\d,]+', price_str)
-            if price_matches:
-                prices = [int(p.replace(',', '')) for p in price_matches]
-                price = min(prices)
-                if 'тэрбум' in price_str.lower() or 'тэрбүм' in price_str.lower():
-                    if price < 100:
-                        price *= 1_000_000_000
-                elif price < 1000:
-                    price *= 1_000_000
-            else:
-                price = 0
+def read_latest_listings_store():
+    """The most recently written store, used as the base for incremental updates"""
+    try:
+        names = [n for n in os.listdir(CACHE_DIR) if n.startswith('listings-') and n.endswith('.feather')]
+    except OSError:
+        return None
+    paths = [os.path.join(CACHE_DIR, n) for n in names]
+    for path in sorted(paths, key=_mtime_or_zero, reverse=True):
+        store = read_listings_store(path)
+        if store is not None:
+            return store
+    return None
+
+def _mtime_or_zero(path):
+    try:
+        return os.path.getmtime(path)
+    except OSError:
+        return 0
 
-            if price <= 10_000_000:
-                price *= area
-            elif 10_000_000 < price < 20_000_000:
-                continue
+def write_listings_store(fingerprint, store):
+    """Publish store under fingerprint and drop the caches of older data files.
 
-            image_str = str(row.get('images', '') or row.get('Image', ''))
-            image_match = re.findall(r'https?://[^\s"\']+', image_str)
-            image_url = image_match[0] if image_match else ''
-            if image_url:
-                image_url = image_url.split()[0].rstrip(',;')
-
-            location = str(row.get('Location', '') or row.get('Place', '') or row.get('Location Detail', ''))
-            district = extract_district(location)
-
-            balcony = str(row.get('Balcony', '')).strip()
-            balcony_count = None
-            if balcony:
-                nums = re.findall(r'\d+', balcony)
-                if nums:
-                    try:
-                        balcony_count = int(nums[0])
-                    except ValueError:
-                        balcony_count = None
-                else:
-                    bl = balcony.lower()
-                    if 'тагтгүй' in bl or 'тагт гүй' in bl or 'no' in bl:
-                        balcony_count = 0
-
-            elevator = str(row.get('Elevator', '')).strip()
-            garage = str(row.get('Garage', '')).strip()
-            window_count = str(row.get('Window Count', '') or row.get('Window', '')).strip()
-            year = str(row.get('Commissioning Year', '')).strip()
-
-            door = str(row.get('Door Type', '') or row.get('Door', '')).strip()
-            floor_type = str(row.get('Floor Type', '') or row.get('Floor_Type', '') or row.get('Floor', '')).strip()
-            rooms = str(row.get('Room Count', '') or row.get('Rooms', '')).strip()
-
-            coords = get_district_coordinates(district, idx)
-
-            if price > 0 and coords:
-                processed.append({
-                    'id': idx,
-                    'title': str(row.get('Title', '') or row.get('Title(0)', 'Property')),
-                    'price': price,
-                    'price_formatted': format_price(price, 'mn'),
-                    'location': location,
-                    'district': district,
-                    'area': area,
-                    'floor': str(row.get('Floor Number', '')),
-                    'building_floor': str(row.get('Building Floor', '')),
-                    'year': year,
-                    'balcony': balcony,
-                    'balcony_count': balcony_count,
-                    'elevator': elevator,
-                    'garage': garage,
-                    'window_count': window_count,
-                    'door': door,
-                    'floor_type': floor_type,
-                    'rooms': rooms,
-                    'description': str(row.get('Description', ''))[:300],
-                    'date': str(row.get('Published Date', '') or row.get('Date', '')),
-                    'views': str(row.get('View Count', '')),
-                    'image_url': image_url,
-                    'link': str(row.get('Title link', '') or row.get('Link', '')),
-                    'lat': coords['lat'],
-                    'lng': coords['lng']
-                })
-        except Exception:
-            continue
+    The store is written to a private temp file and renamed into place, so
+    concurrent readers only ever see a complete file. Writers racing on the same
+    fingerprint produce identical files and the last rename wins.
+    """
+    if feather is None:
+        return
+    try:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=CACHE_DIR, prefix='listings-', suffix='.tmp')
+        os.close(fd)
+    except OSError:
+        return
+    meta = {
+        'version': CACHE_VERSION,
+        'source_size': store['source_size'],
+        'source_sha256': store['source_sha256'],
+        'row_count': store['row_count']
+    }
+    try:
+        table = pa.Table.from_pandas(store['listings'], preserve_index=False)
+        table = table.replace_schema_metadata({
+            **table.schema.metadata,
+            b'unegui': json.dumps(meta).encode(),
+            b'unegui_rejected': store['rejected'].astype('uint64').tobytes()
+        })
+        # uncompressed so later boots can memory-map it
+        feather.write_feather(table, tmp_path, compression='uncompressed')
+        os.replace(tmp_path, _cache_path(fingerprint))
+    except Exception:
+        _remove_quietly(tmp_path)
+        return
+    invalidate_listings_cache(keep=fingerprint)
 
-    result_df = pd.DataFrame(processed)
+def invalidate_listings_cache(keep=None):
+    """Delete cached listings files, search indexes and extraction caches,
+    except the ones for ``keep`` (and the current extraction cache) if given.
 
-    if len(result_df) > 0:
-        result_df = result_df.drop_duplicates(
-            subset=['title', 'price', 'area'],
-            keep='first'
-        )
+    Processes that already memory-mapped a deleted file keep reading it (the
+    data stays alive until they unmap it); new loads miss and rebuild.
+    """
+    try:
+        names = os.listdir(CACHE_DIR)
+    except OSError:
+        return
+    kept = {
+        os.path.basename(_cache_path(keep)), os.path.basename(_search_index_path(keep)),
+        os.path.basename(_extraction_cache_path())
+    } if keep else set()
+    for name in names:
+        if not name.startswith(('listings-', 'search-', 'extractions-')) or name in kept:
+            continue
+        # temp files may belong to a writer that is still running
+        if name.endswith(('.feather', '.npz')) or (keep is None and name.endswith('.tmp')):
+            _remove_quietly(os.path.join(CACHE_DIR, name))
 
-    required_columns = [
-        'year', 'garage', 'elevator', 'balcony', 'balcony_count',
-        'window_count', 'door', 'floor_type', 'rooms', 'price', 'area',
-        'district', 'date', 'link'
-    ]
-    for col in required_columns:
-        if col not in result_df.columns:
-            result_df[col] = None
+def _remove_quietly(path):
+    try:
+        os.remove(path)
+    except OSError:
+        # e.g. still mapped by another process on Windows; retried on the next invalidation
+        pass
+
+def process_listings(df, extractions=None):
+    """Parse a raw scrape frame column-wise into the listings frame used by the app.
+
+    Every column is parsed with pandas ``.str`` operations and NumPy masks and
+    follows the old per-row ``iterrows`` parser, including the rows it skips.
+    Each listing keeps its ``row_number`` in the file and the ``row_hash`` of its
+    raw row so the store can be updated incrementally; nothing is deduplicated
+    here (see finalize_listings).
+
+    Price, floor, building floor and year missing from their columns are taken
+    from the description where it states them (see extract_listing_details;
+    extractions is the cache to use, a fresh one if None).
+    """
+    if extractions is None:
+        extractions = new_extraction_cache()
+    row_hash = raw_row_hashes(df)
+    area_text = _text_column(df, 'Area')
+    area = _to_number(area_text.str.extract(r'([\d.]+)', expand=False), float)
+    # drop 0 m2 and crazy outliers like 7248m2 (unparsable numbers like "1.2.3" too)
+    keep = area.notna() & (area != 0) & (area <= 1000)
+
+    price_text = _text_column(df, 'Price', 'Price(0)')
+    price_groups = price_text.str.extractall(r'([\d,]+)')[0].str.replace(',', '', regex=False)
+    bad_price_rows = price_groups.index.get_level_values(0)[price_groups == '']
+    price_ok = ~df.index.isin(bad_price_rows)
+    price_numbers = _to_number(price_groups[price_groups != ''])
+    price = price_numbers.groupby(level=0).min().reindex(df.index, fill_value=0)
+    price_lower = price_text.str.lower()
+    is_billion = price_lower.str.contains('тэрбум', regex=False) | price_lower.str.contains('тэрбүм', regex=False)
+    price = price.mask(is_billion & (price < 100), price * 1_000_000_000)
+    price = price.mask(~is_billion & (price < 1000), price * 1_000_000)
+
+    # prices under 10M are per m2; 10M-20M is an ambiguous band we drop
+    per_m2 = price <= 10_000_000
+    price_ok &= ~((price > 10_000_000) & (price < 20_000_000)).to_numpy()
+    price = price.astype('float64').mask(per_m2, price * area)
+    price_ok &= (price > 0).to_numpy()
+
+    # the full description, before it is cut for display
+    description = _text_column(df, 'Description')
+    floor = _whole_number_text(_text_column(df, 'Floor Number', 'Floor_Number'))
+    building_floor = _whole_number_text(_text_column(df, 'Building Floor', 'Building_Floor'))
+    year = _whole_number_text(_text_column(df, 'Commissioning Year', 'Year').str.strip())
+    needed = keep.to_numpy() & (
+        ~price_ok | _is_blank(floor) | _is_blank(building_floor) | _is_blank(year)
+    )
+    details = extract_listing_details(extractions, _ad_numbers(df), description, needed)
+    rescued = ~price_ok & details['price_m2'].notna().to_numpy()
+    price = price.mask(rescued, details['price_m2'] * area)
+    keep &= price_ok | rescued
+    floor = _fill_blank(floor, details['floor'])
+    building_floor = _fill_blank(building_floor, details['building_floor'])
+    year = _fill_blank(year, details['year'])
+
+    df = df[keep]
+    area = area[keep]
+    price = price[keep]
+    description, floor, building_floor, year = description[keep], floor[keep], building_floor[keep], year[keep]
+    title = _text_column(df, 'Title', 'Title(0)', default='Property')
+    ids = listing_ids(df, title, price, area)
+
+    image_urls, image_url = split_image_urls(_text_column(df, 'images', 'Image'))
+
+    location = _text_column(df, 'Location', 'Place', 'Location Detail')
+    places = extract_districts(location)
+    district = places['district']
+
+    balcony = _text_column(df, 'Balcony').str.strip()
+    balcony_number = _to_number(balcony.str.extract(r'(\d+)', expand=False))
+    balcony_lower = balcony.str.lower()
+    no_balcony = (
+        balcony_lower.str.contains('тагтгүй', regex=False) |
+        balcony_lower.str.contains('тагт гүй', regex=False) |
+        balcony_lower.str.contains('no', regex=False)
+    )
+    balcony_count = balcony_number.where(
+        balcony_number.notna(),
+        np.where((balcony != '') & no_balcony, 0, np.nan)
+    )
+
+    lat, lng = district_coordinates(district, ids)
+    elevator = _text_column(df, 'Elevator').str.strip()
+    garage = _text_column(df, 'Garage').str.strip()
+    # 'Window' is the window material in the current scrape, the count has its own column
+    window_count = _whole_number_text(_text_column(df, 'Window Count', 'Window_Count', 'Window').str.strip())
+    rooms = _text_column(df, 'Room Count', 'Rooms').str.strip()
+
+    result_df = pd.DataFrame({
+        'id': ids,
+        'row_number': df.index.to_numpy(dtype='int64'),
+        'row_hash': row_hash[keep].to_numpy(),
+        'title': title,
+        'price': price,
+        'price_formatted': format_price_series(price, 'mn'),
+        'location': location,
+        'district': district,
+        'khoroo': places['khoroo'],
+        'area': area,
+        'floor': floor,
+        'building_floor': building_floor,
+        'year': year,
+        'balcony': balcony,
+        'balcony_count': balcony_count,
+        'elevator': elevator,
+        'garage': garage,
+        'window_count': window_count,
+        'door': _text_column(df, 'Door Type', 'Door').str.strip(),
+        'floor_type': _text_column(df, 'Floor Type', 'Floor_Type', 'Floor').str.strip(),
+        'rooms': rooms,
+        'description': description.str[:DESCRIPTION_DISPLAY_CHARS],
+        # the rest is only read by the search index
+        'description_more': description.str[DESCRIPTION_DISPLAY_CHARS:],
+        'date': _text_column(df, 'Published Date', 'Date'),
+        # the scrape keeps the page's label: 'Үзсэн : 13'
+        'views': _text_column(df, 'View Count', 'View_Count').str.replace(r'^Үзсэн\s*:\s*', '', regex=True),
+        'image_url': image_url,
+        'image_urls': image_urls,
+        'link': _text_column(df, 'Title link', 'Title_Link', 'Link'),
+        'lat': lat,
+        'lng': lng,
+        # typed copies of the feature columns, so filters are plain comparisons
+        'has_elevator': _contains_any(elevator, ['shattai', 'шаттай']),
+        'no_elevator': _contains_any(elevator, ['shatgui', 'шатгүй']),
+        'has_garage': _contains_any(garage, ['тийм', 'байгаа', 'yes', 'тайлбар']),
+        'rooms_n': _first_int(rooms),
+        'windows_n': _first_int(window_count),
+        'year_n': _first_int(year)
+    }).reset_index(drop=True)
+    text_columns = result_df.columns[result_df.dtypes == object]
+    result_df[text_columns] = result_df[text_columns].astype(str)
 
     # clean dates (remove 'unuudur/өнөөдөр')
-    result_df['date'] = result_df['date'].apply(clean_date_text)
+    result_df['date'] = clean_date_series(result_df['date'])
 
     return result_df
 
-def clean_date_text(val):
-    if val is None or val == 'nan' or pd.isna(val):
-        return ''
-    s = str(val)
-    for w in ['Өнөөдөр', 'өнөөдөр', 'unuudur', 'unuudur']:
-        s = s.replace(w, '')
-    return s.strip()
-
-def extract_district(location):
-    districts = {
-        'Сүхбаатар': 'Sukhbaatar', 'Sukhbaatar': 'Sukhbaatar', 'СХД': 'Sukhbaatar',
-        'Хан-Уул': 'Khan-Uul', 'Khan-Uul': 'Khan-Uul', 'ХУД': 'Khan-Uul',
-        'Чингэлтэй': 'Chingeltei', 'Chingeltei': 'Chingeltei', 'ЧД': 'Chingeltei',
-        'Баянзүрх': 'Bayanzurkh', 'Bayanzurkh': 'Bayanzurkh', 'БЗД': 'Bayanzurkh',
-        'Сонгинохайрхан': 'Songino Khairkhan', 'Songino Khairkhan': 'Songino Khairkhan',
-        'Баянгол': 'Bayangol', 'Bayangol': 'Bayangol', 'БГД': 'Bayangol'
-    }
-    for key, value in districts.items():
-        if key in location:
-            return value
-    return 'Unknown'
-
-def get_district_coordinates(district, seed):
-    import random
-    random.seed(seed)
-    district_centers = {
-        'Sukhbaatar': (47.9184, 106.9177),
-        'Khan-Uul': (47.8908, 106.9536),
-        'Chingeltei': (47.9245, 106.9034),
-        'Bayanzurkh': (47.9066, 107.0044),
-        'Songino Khairkhan': (47.9089, 106.8041),
-        'Bayangol': (47.9078, 106.8637),
-        'Unknown': (47.9184, 106.9177)
+IMAGE_URL_PATTERN = r'https?://[^\s"\']+'
+
+def split_image_urls(text):
+    """Every photo URL of each listing, newline-separated, and the first one.
+
+    A scrape cell lists up to ~17 URLs separated by whitespace. With pyarrow
+    the whole column is split in one pass and regrouped by offsets, so no
+    Python list is built per row; stored as string[pyarrow], the result is one
+    offsets array into one character buffer.
+    """
+    if pc is None:
+        urls = text.str.findall(IMAGE_URL_PATTERN).map(lambda found: [url.rstrip(',;') for url in found])
+        return urls.str.join('\n'), urls.str[0].fillna('')
+    parts = pc.split_pattern_regex(pa.array(text, type=pa.string(), from_pandas=True), r'[\s"\']+')
+    tokens = pc.utf8_rtrim(pc.list_flatten(parts), characters=',;')
+    is_url = pc.match_substring_regex(tokens, '^https?://')
+    counts = np.bincount(pc.list_parent_indices(parts).filter(is_url).to_numpy(), minlength=len(text))
+    offsets = np.zeros(len(text) + 1, dtype='int32')
+    np.cumsum(counts, out=offsets[1:])
+    urls = pa.ListArray.from_arrays(pa.array(offsets), tokens.filter(is_url))
+    image_urls = pc.binary_join(urls, '\n').to_numpy(zero_copy_only=False)
+    image_url = pc.binary_join(pc.list_slice(urls, 0, 1), '\n').to_numpy(zero_copy_only=False)
+    return pd.Series(image_urls, index=text.index), pd.Series(image_url, index=text.index)
+
+def listing_ids(df, title, price, area):
+    """Primary key of each listing: its Ad_Number.
+
+    Ads scraped without an Ad_Number get a negative surrogate hashed from title,
+    price and area (the old dedup key), so they cannot collide with real ads.
+    """
+    ad_number = _ad_numbers(df)
+    surrogate = pd.util.hash_pandas_object(
+        pd.DataFrame({'title': title, 'price': price, 'area': area}), index=False
+    ).to_numpy()
+    surrogate = -(surrogate >> np.uint64(1)).astype('int64') - 1
+    return np.where(ad_number.notna(), ad_number.fillna(0).to_numpy(dtype='int64'), surrogate)
+
+def _ad_numbers(df):
+    return pd.to_numeric(_text_column(df, 'Ad_Number'), errors='coerce')
+
+# Description extraction: descriptions often state what the structured
+# columns leave out ("💵4 сая ₮/мкв", "16/14 давхарт", "2023 онд
+# ашиглалтанд орсон"). Only listings that still miss a field after their
+# columns are read have their full description parsed; the results are kept
+# per Ad_Number (with a hash of the description) in a cache file, so a
+# description is parsed once even when other cells of its row change.
+EXTRACT_FIELDS = ['price_m2', 'floor', 'building_floor', 'year']
+EXTRACT_VERSION = 1
+# per m2 prices outside this band are totals or typos
+EXTRACT_PRICE_M2_RANGE = (300_000, 30_000_000)
+_EXTRACT_NUMBER = r'(?P<number>[0-9]{1,3}(?:[ ,][0-9]{3})+|[0-9]+(?:[.,][0-9]+)?)'
+_EXTRACT_M2 = r'(?:м\.?\s?кв|м2|м²)'
+EXTRACT_PRICE_M2_PATTERNS = [
+    # "4 сая ₮/мкв"
+    re.compile(_EXTRACT_NUMBER + r'\s*(?P<million>сая)?\s*(?:₮|төг\w*)?\s*/\s*' + _EXTRACT_M2, re.IGNORECASE),
+    # "мкв-ын үнэ: 7.4 сая ₮", "1 м.кв үнэ: 7,000,000 ₮"
+    re.compile(_EXTRACT_M2 + r'[\s-]*(?:ын|ийн|н)?\s*үнэ\s*:?\s*' + _EXTRACT_NUMBER + r'\s*(?P<million>сая)?', re.IGNORECASE)
+]
+# "16/14 давхарт", "7 | 24давхарт" (either order)
+EXTRACT_FLOOR_PAIR_PATTERN = re.compile(r'(?<![0-9-])([0-9]{1,2})\s*[/|]\s*([0-9]{1,2})\s*-?\s*(?:р\s*)?давхар', re.IGNORECASE)
+# "16 давхарын 2-р давхарт"
+EXTRACT_FLOOR_OF_PATTERN = re.compile(
+    r'(?P<building_floor>[0-9]{1,2})\s*давхар(?:ын|ийн)\s+(?P<floor>[0-9]{1,2})\s*(?:-?\s*р)?\s*давхар', re.IGNORECASE
+)
+# "5 давхарт", not "1-5 давхарт" or "5 давхартаа"
+EXTRACT_FLOOR_PATTERN = re.compile(r'(?<![0-9-])([0-9]{1,2})\s*(?:-?\s*р)?\s*давхарт(?!\w)', re.IGNORECASE)
+EXTRACT_YEAR_PATTERNS = [
+    # "2023 онд ашиглалтанд орсон", "2019/12 сард ашиглалтанд орсон"
+    re.compile(r'((?:19[5-9]|20[0-4])[0-9])\s*(?:/\s*[0-9]{1,2}\s*сард|он\w*)[^\n.]{0,20}?ашиглалт', re.IGNORECASE),
+    # "ашиглалтанд орсон он: 2019"
+    re.compile(r'ашиглалт\w*\s+(?:орсон\s+)?он\s*:?\s*((?:19[5-9]|20[0-4])[0-9])', re.IGNORECASE)
+]
+
+def extract_description_fields(descriptions):
+    """EXTRACT_FIELDS of every description (a list of str) as a float array,
+    NaN where the description does not state a field"""
+    text = pd.Series(descriptions, dtype=object)
+    fields = pd.DataFrame(np.nan, index=text.index, columns=EXTRACT_FIELDS)
+    if len(text) == 0:
+        return fields.to_numpy()
+    lower = text.str.lower()
+
+    def extract(pattern, gate):
+        # the patterns start with a digit; rows without the gate text are not scanned
+        rows = lower.str.contains(gate, regex=False)
+        return text[rows].str.extract(pattern).reindex(text.index)
+
+    for pattern, gate in zip(EXTRACT_PRICE_M2_PATTERNS, ['/', 'үнэ']):
+        found = extract(pattern, gate)
+        digits = found['number'].str.replace(r'[ ,](?=[0-9]{3}(?![0-9]))', '', regex=True)
+        number = pd.to_numeric(digits.str.replace(',', '.', regex=False), errors='coerce')
+        # "4 сая" and a bare "4" both mean millions, like the Price column
+        number = number.mask(found['million'].notna() | (number < 1000), number * 1_000_000)
+        fields['price_m2'] = fields['price_m2'].fillna(number.where(number.between(*EXTRACT_PRICE_M2_RANGE)))
+
+    pair = extract(EXTRACT_FLOOR_PAIR_PATTERN, 'давхар').astype('float64')
+    floor_of = extract(EXTRACT_FLOOR_OF_PATTERN, 'давхар').astype('float64')
+    floor_of = floor_of.where(floor_of['floor'] <= floor_of['building_floor'])
+    fields['floor'] = pair.min(axis=1).fillna(floor_of['floor']).fillna(
+        extract(EXTRACT_FLOOR_PATTERN, 'давхарт')[0].astype('float64')
+    )
+    fields['building_floor'] = pair.max(axis=1).fillna(floor_of['building_floor'])
+
+    for pattern in EXTRACT_YEAR_PATTERNS:
+        fields['year'] = fields['year'].fillna(extract(pattern, 'ашиглалт')[0].astype('float64'))
+    return fields.to_numpy()
+
+def new_extraction_cache(table=None):
+    """Extracted fields per Ad_Number, with the hash of the description they
+    came from, plus what this ingest parsed and how fast"""
+    if table is None:
+        table = pd.DataFrame({
+            'id': np.empty(0, dtype='int64'), 'description_hash': np.empty(0, dtype='uint64'),
+            **{field: np.empty(0) for field in EXTRACT_FIELDS}
+        })
+    return {
+        'table': table.set_index('id'),
+        'added': [],
+        'stats': {'parsed': 0, 'cached': 0, 'seconds': 0.0}
     }
-    center = district_centers.get(district, district_centers['Unknown'])
-    lat_offset = random.uniform(-0.025, 0.025)
-    lng_offset = random.uniform(-0.025, 0.025)
-    return {'lat': center[0] + lat_offset, 'lng': center[1] + lng_offset}
+
+def extract_listing_details(cache, ad_numbers, descriptions, needed):
+    """EXTRACT_FIELDS for the listings where needed is set (NaN elsewhere),
+    from the extraction cache or parsed (and added to it)"""
+    fields = pd.DataFrame(np.nan, index=descriptions.index, columns=EXTRACT_FIELDS)
+    needed = np.asarray(needed, dtype=bool)
+    if not needed.any():
+        return fields
+    hashes = pd.util.hash_pandas_object(descriptions, index=False).to_numpy()
+    ids = ad_numbers.fillna(-1).to_numpy(dtype='int64')
+    table = cache['table']
+    slots = table.index.get_indexer(ids) if table.index.is_unique else np.full(len(ids), -1)
+    hit = needed & (slots >= 0) & ad_numbers.notna().to_numpy()
+    hit[hit] = table['description_hash'].to_numpy()[slots[hit]] == hashes[hit]
+    fields.iloc[np.flatnonzero(hit)] = table[EXTRACT_FIELDS].to_numpy()[slots[hit]]
+
+    missed = np.flatnonzero(needed & ~hit)
+    started = time.perf_counter()
+    parsed = extract_description_fields(descriptions.iloc[missed].tolist())
+    fields.iloc[missed] = parsed
+    stats = cache['stats']
+    stats['seconds'] += time.perf_counter() - started
+    stats['parsed'] += len(missed)
+    stats['cached'] += int(hit.sum())
+
+    # listings without an Ad_Number are parsed every time
+    keyed = ad_numbers.notna().to_numpy()[missed]
+    cache['added'].append(pd.DataFrame({
+        'id': ids[missed][keyed], 'description_hash': hashes[missed][keyed],
+        **{field: parsed[keyed, i] for i, field in enumerate(EXTRACT_FIELDS)}
+    }))
+    return fields
+
+def _extraction_cache_path():
+    return os.path.join(CACHE_DIR, f"extractions-v{EXTRACT_VERSION}.feather")
+
+def read_extraction_cache():
+    """The persisted extraction cache, or an empty one"""
+    if feather is None:
+        return new_extraction_cache()
+    try:
+        table = feather.read_table(_extraction_cache_path()).to_pandas()
+    except (OSError, ValueError, pa.ArrowInvalid):
+        return new_extraction_cache()
+    if list(table.columns) != ['id', 'description_hash', *EXTRACT_FIELDS]:
+        return new_extraction_cache()
+    return new_extraction_cache(table)
+
+def write_extraction_cache(cache, ids):
+    """Persist the extraction cache, keeping only the listings in ids"""
+    if feather is None:
+        return
+    table = pd.concat([cache['table'].reset_index(), *cache['added']], ignore_index=True)
+    table = table.drop_duplicates(subset=['id'], keep='last')
+    table = table[table['id'].isin(ids)].reset_index(drop=True)
+    try:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=CACHE_DIR, prefix='extractions-', suffix='.tmp')
+        os.close(fd)
+    except OSError:
+        return
+    try:
+        feather.write_feather(table, tmp_path)
+        os.replace(tmp_path, _extraction_cache_path())
+    except Exception:
+        _remove_quietly(tmp_path)
+
+def _whole_number_text(text):
+    """'14.0' -> '14' (scrapes that went through a float column); other text unchanged"""
+    return text.str.replace(r'^([0-9]+)\.0+$', r'\1', regex=True)
+
+def _is_blank(text):
+    return text.str.strip().isin(['', 'nan']).to_numpy()
+
+def _fill_blank(text, numbers):
+    """text with its blank cells ('' or 'nan') set to the whole numbers given, where known"""
+    fill = _is_blank(text) & numbers.notna().to_numpy()
+    text = text.copy()
+    text[fill] = numbers[fill].astype('int64').astype(str)
+    return text
+
+def _text_column(df, *names, default=''):
+    """Column-wise ``str(row.get(a, '') or row.get(b, '') or ...)``.
+
+    Falsy cells ('' and 0) fall through to the next column, NaN does not, and
+    the result is rendered the way ``str()`` renders it (NaN -> 'nan').
+    """
+    result = pd.Series(default, index=df.index, dtype=object)
+    for i, name in enumerate(reversed(names)):
+        if name not in df.columns:
+            continue
+        col = df[name]
+        if i == 0:
+            result = col
+        elif pd.api.types.is_numeric_dtype(col) or pd.api.types.is_bool_dtype(col):
+            result = col.where(col.ne(0), result)
+        elif pd.api.types.is_string_dtype(col) and col.dtype != object:
+            result = col.where(col.isna() | col.str.len().gt(0), result)
+        else:
+            result = col.where(col.map(bool), result)
+    # object dtype keeps the .str regexes on Python's re (Arrow strings use RE2,
+    # whose \d is ASCII-only)
+    return result.astype(str).fillna('nan').astype(object)
+
+def _contains_any(text, words):
+    """Case-insensitive test for any of words in each string (vectorized has_feature)"""
+    lower = text.str.lower()
+    found = np.zeros(len(text), dtype=bool)
+    for word in words:
+        found |= lower.str.contains(word, regex=False).to_numpy(dtype=bool)
+    return found
+
+def _first_int(text):
+    """First number in each string as a nullable Int16 (NA when absent or out of range)"""
+    numbers = _to_number(text.str.extract(r'(\d+)', expand=False)).astype('float64')
+    numbers = numbers.where((numbers >= -32768) & (numbers <= 32767))
+    return numbers.astype('Int16')
+
+def range_mask(column, low, high, keep_missing=False):
+    """low <= column <= high as a NumPy mask; missing values pass only if keep_missing"""
+    values = column.to_numpy(dtype='float64', na_value=np.nan)
+    mask = (values >= low) & (values <= high)
+    if keep_missing:
+        mask |= np.isnan(values)
+    return mask
+
+def _to_number(values, convert=int):
+    """Convert matched digit strings to numbers; NaN where conversion fails."""
+    numbers = pd.to_numeric(values, errors='coerce')
+    # non-ASCII digits (e.g. '٣') are matched by \d and accepted by int()/float(),
+    # but not by to_numeric
+    leftover = numbers.isna() & values.notna()
+    if leftover.any():
+        numbers = numbers.astype(object)
+        numbers[leftover] = values[leftover].map(lambda v: _convert_or_nan(convert, v))
+        numbers = pd.to_numeric(numbers)
+    return numbers
+
+def _convert_or_nan(convert, value):
+    try:
+        return convert(value)
+    except ValueError:
+        return np.nan
+
+def clean_date_series(dates):
+    """Dates with 'today' (Өнөөдөр / unuudur) removed; missing dates become ''"""
+    blank = dates.isna() | (dates.astype(str) == 'nan')
+    s = dates.where(~blank, '').astype(str)
+    for w in ['Өнөөдөр', 'өнөөдөр', 'unuudur', 'unuudur']:
+        s = s.str.replace(w, '', regex=False)
+    return s.str.strip().astype(str)
+
+DISTRICT_ALIASES = {
+    'Сүхбаатар': 'Sukhbaatar', 'Sukhbaatar': 'Sukhbaatar', 'СХД': 'Sukhbaatar',
+    'Хан-Уул': 'Khan-Uul', 'Khan-Uul': 'Khan-Uul', 'ХУД': 'Khan-Uul',
+    'Чингэлтэй': 'Chingeltei', 'Chingeltei': 'Chingeltei', 'ЧД': 'Chingeltei',
+    'Баянзүрх': 'Bayanzurkh', 'Bayanzurkh': 'Bayanzurkh', 'БЗД': 'Bayanzurkh',
+    'Сонгинохайрхан': 'Songino Khairkhan', 'Songino Khairkhan': 'Songino Khairkhan',
+    'Баянгол': 'Bayangol', 'Bayangol': 'Bayangol', 'БГД': 'Bayangol'
+}
+# first district name in the location, then (optionally) the khoroo after it:
+# "УБ — Сүхбаатар, Сүхбаатар, Хороо 6" or "Сүхбаатар — 6-р хороо" (not "10-р хороолол")
+DISTRICT_PATTERN = re.compile(
+    r'(?P<district>' + '|'.join(map(re.escape, sorted(DISTRICT_ALIASES, key=len, reverse=True))) + r')'
+    r'(?:.*?(?:[Хх]ороо\s*(?P<khoroo>\d+)|(?P<khoroo_suffix>\d+)\s*-?\s*р\s+[Хх]ороо(?![Лл])))?',
+    re.DOTALL
+)
+
+def extract_districts(locations):
+    """District and khoroo of every location string, in one regex pass.
+
+    Returns a frame with ``district`` ('Unknown' when no district is named) and
+    ``khoroo`` (NaN when the location does not name one).
+    """
+    locations = pd.Series(locations, dtype=object)
+    # scraped locations repeat a lot, so match each distinct string once
+    codes, uniques = pd.factorize(locations, use_na_sentinel=False)
+    found = pd.Series(uniques, dtype=object).str.extract(DISTRICT_PATTERN)
+    district = found['district'].map(DISTRICT_ALIASES).fillna('Unknown').astype(str)
+    khoroo = _to_number(found['khoroo'].fillna(found['khoroo_suffix'])).astype('float64')
+    return pd.DataFrame({
+        'district': district.to_numpy()[codes],
+        'khoroo': khoroo.to_numpy()[codes]
+    }, index=locations.index).astype({'district': str})
+
+DISTRICT_CENTERS = {
+    'Sukhbaatar': (47.9184, 106.9177),
+    'Khan-Uul': (47.8908, 106.9536),
+    'Chingeltei': (47.9245, 106.9034),
+    'Bayanzurkh': (47.9066, 107.0044),
+    'Songino Khairkhan': (47.9089, 106.8041),
+    'Bayangol': (47.9078, 106.8637),
+    'Unknown': (47.9184, 106.9177)
+}
+# markers are scattered up to this many degrees around their district center
+JITTER_DEGREES = 0.025
+JITTER_KEY = (0x756E6567, 0x75692E6D)
+
+def district_coordinates(districts, ids):
+    """Jittered marker coordinates for whole columns of districts and listing ids.
+
+    The offsets come from a counter-based generator (Philox4x32-10) with the
+    listing id as the counter, so a listing lands on the same spot on every run
+    and no global RNG state is touched. Returns (lat, lng) arrays.
+    """
+    codes, names = pd.factorize(np.asarray(districts, dtype=object))
+    # one row per distinct district, plus 'Unknown' last for missing values (code -1)
+    centers = np.array(
+        [DISTRICT_CENTERS.get(name, DISTRICT_CENTERS['Unknown']) for name in names] +
+        [DISTRICT_CENTERS['Unknown']],
+        dtype='float64'
+    )
+    center_lat, center_lng = centers[codes, 0], centers[codes, 1]
+
+    ids = np.asarray(ids, dtype='int64').view('uint64')
+    zero = np.zeros_like(ids)
+    words = _philox4x32((ids & 0xFFFFFFFF, ids >> np.uint64(32), zero, zero), JITTER_KEY)
+    lat_offset = (2 * _uniform53(words[0], words[1]) - 1) * JITTER_DEGREES
+    lng_offset = (2 * _uniform53(words[2], words[3]) - 1) * JITTER_DEGREES
+    return center_lat + lat_offset, center_lng + lng_offset
+
+def _philox4x32(counter, key, rounds=10):
+    """Philox4x32 block function (Random123) over uint64 arrays holding 32-bit words"""
+    mask = np.uint64(0xFFFFFFFF)
+    c0, c1, c2, c3 = (np.asarray(c, dtype='uint64') & mask for c in counter)
+    k0, k1 = np.uint64(key[0]), np.uint64(key[1])
+    for r in range(rounds):
+        if r:
+            k0 = (k0 + np.uint64(0x9E3779B9)) & mask
+            k1 = (k1 + np.uint64(0xBB67AE85)) & mask
+        p0 = np.uint64(0xD2511F53) * c0
+        p1 = np.uint64(0xCD9E8D57) * c2
+        c0, c1, c2, c3 = (
+            (p1 >> np.uint64(32)) ^ c1 ^ k0,
+            p1 & mask,
+            (p0 >> np.uint64(32)) ^ c3 ^ k1,
+            p0 & mask
+        )
+    return c0, c1, c2, c3
+
+def _uniform53(hi, lo):
+    # same 53-bit construction as random.random(): 27 + 26 bits of two words
+    return ((hi >> np.uint64(5)) * 67108864.0 + (lo >> np.uint64(6))) / 9007199254740992.0
+
+USD_RATE = 3400
 
 def format_price(price, lang='mn'):
-    USD_RATE = 3400
     if lang == 'mn':
         if price >= 1_000_000_000:
             return f"₮{price/1_000_000_000:.1f} тэрбум"
@@ -392,6 +1297,30 @@ def format_price(price, lang='mn'):
         else:
             return f"${usd:.0f}"
 
+def format_price_series(prices, lang='mn'):
+    """Vectorized format_price for a whole price column"""
+    prices = pd.Series(prices, dtype='float64')
+    values = prices.to_numpy()
+    if lang == 'mn':
+        billions = values >= 1_000_000_000
+        millions = ~billions & (values >= 1_000_000)
+        out = np.char.add(np.char.add('₮', np.char.mod('%.1f', values / 1_000_000_000)), ' тэрбум')
+        out = np.where(millions, np.char.add(np.char.add('₮', np.char.mod('%.0f', values / 1_000_000)), ' сая'), out)
+        small = ~billions & ~millions
+    else:
+        return prices.map(lambda p: format_price(p, lang))
+    result = pd.Series(out, index=prices.index).astype(str)
+    if small.any():
+        result[small] = prices[small].map(lambda p: format_price(p, lang))
+    return result
+
+def format_price_m2_series(prices, lang='mn'):
+    """Prices per m² (a few million tugriks), with the precision format_price rounds away"""
+    prices = pd.Series(prices, dtype='float64')
+    if lang == 'mn':
+        return prices.map(lambda p: f"₮{p / 1_000_000:.2f} сая")
+    return prices.map(lambda p: f"${p / USD_RATE:,.0f}")
+
 def get_marker_color(price):
     if price < 200_000_000:
         return 'green'
@@ -402,27 +1331,1770 @@ def get_marker_color(price):
     else:
         return 'red'
 
+def marker_colors(prices):
+    """Vectorized get_marker_color"""
+    prices = np.asarray(prices, dtype='float64')
+    return np.select(
+        [prices < 200_000_000, prices < 400_000_000, prices < 600_000_000],
+        ['green', 'blue', 'orange'],
+        'red'
+    )
+
 def has_feature(value):
     if not value or value == 'nan' or value == '' or pd.isna(value):
         return False
     v = str(value).lower()
     return 'тийм' in v or 'байгаа' in v or 'yes' in v or 'тайлбар' in v
 
-def is_elevator_yes(value):
-    if not value or value == 'nan' or value == '' or pd.isna(value):
-        return False
-    v = str(value).strip().lower()
-    return 'shattai' in v or 'шаттай' in v
+def filter_masks(df, filters):
+    """One boolean NumPy mask per active filter, computed on the full frame.
 
-def is_elevator_no(value):
-    if not value or value == 'nan' or value == '' or pd.isna(value):
-        return False
-    v = str(value).strip().lower()
-    return 'shatgui' in v or 'шатгүй' in v
+    ``filters`` maps a filter name to its normalized value, e.g.
+    {'district': ('Bayangol',), 'price': (lo, hi), 'elevator': 'yes'}.
+    """
+    masks = {}
+    for name, value in filters.items():
+        if name == 'district':
+            mask = df['district'].isin(value).to_numpy()
+        elif name == 'price':
+            mask = range_mask(df['price'], *value)
+        elif name == 'area':
+            mask = range_mask(df['area'], *value)
+        elif name == 'elevator':
+            mask = df['has_elevator' if value == 'yes' else 'no_elevator'].to_numpy()
+        elif name == 'garage':
+            mask = df['has_garage'].to_numpy() == (value == 'yes')
+        elif name in ('door', 'floor_type'):
+            mask = (df[name] == value).to_numpy(dtype=bool)
+        elif name == 'rooms':
+            mask = range_mask(df['rooms_n'], *value)
+        elif name == 'balcony':
+            mask = range_mask(df['balcony_count'], *value)
+        elif name == 'year':
+            # listings without a known year are never hidden by the year slider
+            mask = range_mask(df['year_n'], *value, keep_missing=True)
+        elif name == 'windows':
+            mask = range_mask(df['windows_n'], *value)
+        else:
+            raise KeyError(f"unknown filter: {name}")
+        masks[name] = mask
+    return masks
+
+def apply_filters(df, filters, index=None):
+    """Select the listings matching every filter, indexing the frame only once.
+
+    With a listings index (see build_listings_index) the predicates are
+    answered from its bitmaps; otherwise each one is a mask over the frame.
+    Returns the filtered frame and the selectivity of each predicate: the
+    share of all listings it keeps on its own.
+    """
+    positions, selectivity = filter_positions(df, filters, index)
+    return (df if positions is None else df.iloc[positions]), selectivity
+
+def filter_positions(df, filters, index=None):
+    """Row positions matching every filter (None: all rows) and selectivities"""
+    if not filters:
+        return None, {}
+    if index is not None:
+        return index_query(index, filters)
+    masks = filter_masks(df, filters)
+    selectivity = {name: float(mask.mean()) if len(mask) else 0.0 for name, mask in masks.items()}
+    return np.flatnonzero(np.logical_and.reduce(list(masks.values()))), selectivity
+
+# range filters -> indexed numeric column
+INDEX_RANGE_COLUMNS = {
+    'price': 'price', 'area': 'area', 'rooms': 'rooms_n',
+    'balcony': 'balcony_count', 'year': 'year_n', 'windows': 'windows_n'
+}
+INDEX_VALUE_COLUMNS = ['district', 'door', 'floor_type']
+INDEX_FLAG_COLUMNS = ['has_elevator', 'no_elevator', 'has_garage']
+# sorted ranks are cut into this many blocks with a prefix bitmap at every cut
+INDEX_BLOCKS = 16
+_POPCOUNT = np.array([bin(i).count('1') for i in range(256)], dtype=np.uint8)
+_BIT_OFFSETS = np.arange(8)
+
+def build_listings_index(df):
+    """In-memory index over the filterable columns of the listings frame.
+
+    Bitmaps are packed (one bit per listing). Numeric columns keep their
+    sorted values and permutation plus prefix bitmaps at INDEX_BLOCKS rank
+    cuts, so a range is two prefix bitmaps XORed together plus the few ranks
+    at its ragged ends. Categorical values and the boolean flags get one
+    bitmap each.
+    """
+    size = len(df)
+    ranges = {}
+    for name, col in INDEX_RANGE_COLUMNS.items():
+        values = df[col].to_numpy(dtype='float64', na_value=np.nan)
+        present = np.flatnonzero(~np.isnan(values))
+        order = present[np.argsort(values[present], kind='stable')]
+        bounds = np.unique(np.linspace(0, len(order), INDEX_BLOCKS + 1).astype(np.int64))
+        ranked = np.zeros(size, dtype=bool)
+        prefixes = []
+        for start, stop in zip(np.r_[0, bounds[:-1]], bounds):
+            ranked[order[start:stop]] = True
+            prefixes.append(_pack_bits(ranked))
+        ranges[name] = {
+            'values': values[order],
+            'order': order,
+            'bounds': bounds,
+            'prefixes': prefixes,
+            'missing': _pack_bits(np.isnan(values))
+        }
+    values = {}
+    for col in INDEX_VALUE_COLUMNS:
+        codes, uniques = pd.factorize(df[col])
+        values[col] = {value: _pack_bits(codes == code) for code, value in enumerate(uniques)}
+    return {
+        'size': size,
+        'all': _pack_bits(np.ones(size, dtype=bool)),
+        'ranges': ranges,
+        'values': values,
+        'flags': {col: _pack_bits(df[col].to_numpy(dtype=bool)) for col in INDEX_FLAG_COLUMNS}
+    }
+
+def _pack_bits(mask):
+    return np.packbits(mask, bitorder='little')
+
+def _popcount(bitmap):
+    if hasattr(np, 'bitwise_count'):
+        return int(np.bitwise_count(bitmap).sum())
+    return int(_POPCOUNT[bitmap].sum())
+
+def _bitmap_positions(bitmap, size):
+    occupied = np.flatnonzero(bitmap)
+    if len(occupied) * 16 < len(bitmap):
+        # sparse result: unpack only the bytes that have a bit set
+        bits = np.unpackbits(bitmap[occupied, None], axis=1, bitorder='little').view(bool)
+        return (occupied[:, None] * 8 + _BIT_OFFSETS)[bits]
+    return np.flatnonzero(np.unpackbits(bitmap, count=size, bitorder='little').view(bool))
+
+def _range_bitmap(index, name, low, high):
+    entry = index['ranges'][name]
+    lo = np.searchsorted(entry['values'], low, side='left')
+    hi = np.searchsorted(entry['values'], high, side='right')
+    bounds, order = entry['bounds'], entry['order']
+    first = np.searchsorted(bounds, lo, side='left')
+    last = np.searchsorted(bounds, hi, side='right') - 1
+    if first < last:
+        # whole blocks between two cuts; prefixes nest, so XOR is the difference
+        bitmap = entry['prefixes'][last] ^ entry['prefixes'][first]
+        edges = np.concatenate([order[lo:bounds[first]], order[bounds[last]:hi]])
+    else:
+        bitmap = np.zeros_like(index['all'])
+        edges = order[lo:hi]
+    if len(edges):
+        bits = np.zeros(index['size'], dtype=bool)
+        bits[edges] = True
+        bitmap = bitmap | _pack_bits(bits)
+    return bitmap
+
+def _filter_bitmap(index, name, value):
+    if name == 'district':
+        bitmap = np.zeros_like(index['all'])
+        for district in value:
+            if district in index['values']['district']:
+                bitmap = bitmap | index['values']['district'][district]
+        return bitmap
+    if name in ('door', 'floor_type'):
+        return index['values'][name].get(value, np.zeros_like(index['all']))
+    if name == 'elevator':
+        return index['flags']['has_elevator' if value == 'yes' else 'no_elevator']
+    if name == 'garage':
+        has_garage = index['flags']['has_garage']
+        return has_garage if value == 'yes' else index['all'] ^ has_garage
+    if name in INDEX_RANGE_COLUMNS:
+        bitmap = _range_bitmap(index, name, *value)
+        if name == 'year':
+            # listings without a known year are never hidden by the year slider
+            bitmap = bitmap | index['ranges']['year']['missing']
+        return bitmap
+    raise KeyError(f"unknown filter: {name}")
+
+def index_query(index, filters):
+    """Row positions matching every filter, and each filter's selectivity"""
+    size = index['size']
+    result = index['all']
+    selectivity = {}
+    for name, value in filters.items():
+        bitmap = _filter_bitmap(index, name, value)
+        selectivity[name] = _popcount(bitmap) / size if size else 0.0
+        result = result & bitmap
+    return _bitmap_positions(result, size), selectivity
+
+# Shared caches (filter results, cluster levels, ...) are small LRU dicts
+# guarded by a lock; sessions run on separate threads
+def new_lru_cache(max_entries, max_bytes, on_evict=None):
+    return {
+        'entries': OrderedDict(),
+        'bytes': 0,
+        'max_entries': max_entries,
+        'max_bytes': max_bytes,
+        'hits': 0,
+        'misses': 0,
+        'lock': threading.Lock(),
+        # called as on_evict(key, value) after the lock is released
+        'on_evict': on_evict
+    }
+
+def lru_lookup(cache, key):
+    """Cached value for key (marking it recently used), or None"""
+    with cache['lock']:
+        entry = cache['entries'].get(key)
+        if entry is None:
+            cache['misses'] += 1
+            return None
+        cache['entries'].move_to_end(key)
+        cache['hits'] += 1
+        return entry[0]
+
+def lru_store(cache, key, value, nbytes):
+    """Insert value, evicting least recently used entries over either cap"""
+    evicted = []
+    with cache['lock']:
+        entries = cache['entries']
+        if key not in entries:
+            entries[key] = (value, nbytes)
+            cache['bytes'] += nbytes
+        while entries and (len(entries) > cache['max_entries'] or cache['bytes'] > cache['max_bytes']):
+            evicted_key, (evicted_value, evicted_bytes) = entries.popitem(last=False)
+            cache['bytes'] -= evicted_bytes
+            evicted.append((evicted_key, evicted_value))
+    if cache['on_evict'] is not None:
+        for evicted_key, evicted_value in evicted:
+            cache['on_evict'](evicted_key, evicted_value)
+    return value
+
+def lru_discard(cache, key):
+    """Remove key if it is cached (not an eviction: on_evict is not called)"""
+    with cache['lock']:
+        entry = cache['entries'].pop(key, None)
+        if entry is not None:
+            cache['bytes'] -= entry[1]
+
+# Filter results are shared by every session: the positions and summary
+# stats of recent filter states
+FILTER_CACHE_ENTRIES = 256
+FILTER_CACHE_BYTES = 64 * 1024 * 1024
+
+def new_filter_cache(max_entries=FILTER_CACHE_ENTRIES, max_bytes=FILTER_CACHE_BYTES):
+    return new_lru_cache(max_entries, max_bytes)
+
+def filter_cache_key(filters):
+    """Canonical form of a filter state, equal for equal filters"""
+    def canonical(value):
+        if isinstance(value, (tuple, list)):
+            return tuple(canonical(item) for item in value)
+        if isinstance(value, np.generic):
+            value = value.item()
+        if isinstance(value, float) and value.is_integer():
+            return int(value)
+        return value
+    return tuple(sorted((name, canonical(value)) for name, value in filters.items()))
+
+def listing_set_digest(ids):
+    """Short hash of a set of listing ids (given in frame order)"""
+    return hashlib.blake2b(np.ascontiguousarray(ids, dtype=np.int64).tobytes(), digest_size=16).hexdigest()
+
+def summary_stats(listings):
+    if len(listings) == 0:
+        return {'count': 0}
+    return {
+        'count': len(listings),
+        'mean_price': listings['price'].mean(),
+        'median_price': listings['price'].median(),
+        'mean_area': listings['area'].mean() if listings['area'].sum() > 0 else 0
+    }
+
+def cached_filter_result(cache, df, filters, index=None):
+    """Positions, selectivity and summary stats for a filter state, memoized in cache"""
+    key = filter_cache_key(filters)
+    result = lru_lookup(cache, key)
+    if result is not None:
+        return result
+    positions, selectivity = filter_positions(df, filters, index)
+    if positions is not None:
+        positions.setflags(write=False)
+    ids = df['id'].to_numpy()
+    result = {
+        'key': key,
+        'digest': listing_set_digest(ids if positions is None else ids[positions]),
+        'positions': positions,
+        'selectivity': selectivity,
+        'stats': summary_stats(df if positions is None else df.iloc[positions])
+    }
+    return lru_store(cache, key, result, 0 if positions is None else positions.nbytes)
+
+# Full-text search over title and description: an inverted index from
+# normalized terms to the listings (frame positions) using them. Terms are
+# kept sorted, so every term starting with a query word is one contiguous
+# slice of the postings, and each posting carries its precomputed BM25 weight.
+SEARCH_K1 = 1.2
+SEARCH_B = 0.75
+# the title is indexed this many times, so title words outweigh description words
+SEARCH_TITLE_WEIGHT = 2
+# shorter query words only match whole terms ("2" is not every number starting with 2)
+SEARCH_MIN_PREFIX = 3
+SEARCH_VERSION = 2
+# Mongolian Cyrillic spelled the way it is usually typed in Latin letters, so
+# "Могул" and "mogul" are the same term; ө/ү (and ö/ü) fold into o/u
+SEARCH_TRANSLITERATION = str.maketrans({
+    'а': 'a', 'б': 'b', 'в': 'v', 'г': 'g', 'д': 'd', 'е': 'e', 'ё': 'yo', 'ж': 'j',
+    'з': 'z', 'и': 'i', 'й': 'i', 'к': 'k', 'л': 'l', 'м': 'm', 'н': 'n', 'о': 'o',
+    'ө': 'o', 'п': 'p', 'р': 'r', 'с': 's', 'т': 't', 'у': 'u', 'ү': 'u', 'ф': 'f',
+    'х': 'h', 'ц': 'ts', 'ч': 'ch', 'ш': 'sh', 'щ': 'sh', 'ъ': '', 'ы': 'y', 'ь': '',
+    'э': 'e', 'ю': 'yu', 'я': 'ya', 'ö': 'o', 'ü': 'u'
+})
+SEARCH_WORD_PATTERN = r'[^\W_]+'
+
+def normalize_search_term(word):
+    """Index/query form of one lowercase word"""
+    # NFKC turns styled letters and digits ("𝟲", "²") into plain ones;
+    # "kh" and "h" are both common spellings of х
+    word = unicodedata.normalize('NFKC', word).lower()
+    return word.translate(SEARCH_TRANSLITERATION).replace('kh', 'h')
+
+def search_words(query):
+    """Normalized words of a search query, in order, without repeats"""
+    words = (normalize_search_term(word) for word in re.findall(SEARCH_WORD_PATTERN, query.lower()))
+    return tuple(dict.fromkeys(word for word in words if word))
+
+# Tokenizing scans the UTF-8 bytes: ASCII letters and digits are word bytes,
+# and so is every byte of a multi-byte character (Cyrillic letters take two).
+# The few non-ASCII non-letters this lets into a token are split off when the
+# distinct tokens are normalized.
+_SEARCH_WORD_BYTES = np.isin(np.arange(256), list(b'0123456789abcdefghijklmnopqrstuvwxyz')) | (np.arange(256) >= 0x80)
+
+def _search_tokens(text):
+    """Runs of word bytes in a lowercase large_string array, as an Arrow array
+    of tokens (with the delimiters after them) and the row of every token"""
+    _, offsets, data = text.buffers()
+    offsets = np.frombuffer(offsets, dtype=np.int64)[text.offset:text.offset + len(text) + 1]
+    data = np.frombuffer(data, dtype=np.uint8)[:offsets[-1]] if data is not None else np.empty(0, dtype=np.uint8)
+    is_word = _SEARCH_WORD_BYTES[data]
+    is_word[:offsets[0]] = False
+    follows_word = np.empty_like(is_word)
+    follows_word[:1] = False
+    follows_word[1:] = is_word[:-1]
+    # a row always starts a new token
+    follows_word[offsets[:-1][offsets[:-1] < len(data)]] = False
+    starts = np.flatnonzero(is_word & ~follows_word)
+    del is_word, follows_word
+    token_offsets = np.append(starts, offsets[-1]).astype(np.int64)
+    tokens = pa.LargeStringArray.from_buffers(len(starts), pa.py_buffer(token_offsets), text.buffers()[2])
+    return tokens, np.searchsorted(offsets, starts, side='right') - 1
+
+def build_search_index(df):
+    """Inverted index over the title and full description of every listing.
+
+    Only the distinct raw tokens are split into words and normalized in
+    Python (the same way queries are); postings are grouped with one sort of
+    (term, listing) keys.
+    """
+    n_docs = len(df)
+    if n_docs == 0:
+        return {
+            'terms': np.array([], dtype=object), 'offsets': np.zeros(1, dtype='int64'),
+            'docs': np.empty(0, dtype='int32'), 'weights': np.empty(0, dtype='float32'), 'n_docs': 0
+        }
+    title = pa.array(df['title'].astype(str), type=pa.large_string())
+    # the display cut can split a word, so the two parts are joined directly
+    description = pc.binary_join_element_wise(
+        pa.array(df['description'].astype(str), type=pa.large_string()),
+        pa.array(df['description_more'].astype(str), type=pa.large_string()),
+        pa.scalar('', pa.large_string())
+    )
+    text = pc.utf8_lower(pc.binary_join_element_wise(*[title] * SEARCH_TITLE_WEIGHT, description, pa.scalar(' ', pa.large_string())))
+    del title, description
+    tokens, doc_of_token = _search_tokens(text)
+    encoded = pc.dictionary_encode(tokens)
+    del tokens
+
+    # the words of every distinct token; several tokens can share a term
+    # (e.g. Cyrillic and Latin spellings, or trailing punctuation)
+    token_words = [
+        [term for term in map(normalize_search_term, re.findall(SEARCH_WORD_PATTERN, token)) if term]
+        for token in encoded.dictionary.to_pylist()
+    ]
+    word_counts = np.array([len(words) for words in token_words], dtype=np.int64)
+    terms, word_terms = np.unique(
+        np.array([word for words in token_words for word in words], dtype=object), return_inverse=True
+    )
+    word_starts = np.cumsum(word_counts) - word_counts
+    token_entry = encoded.indices.to_numpy()
+    per_token = word_counts[token_entry]
+    doc_of_word = np.repeat(doc_of_token, per_token)
+    word_index = np.repeat(word_starts[token_entry] - (np.cumsum(per_token) - per_token), per_token)
+    word_index += np.arange(len(word_index))
+    term_of_word = word_terms[word_index]
+    del token_entry, per_token, word_index
+
+    # one posting per (term, listing), term-major and by position within a term
+    keys, tf = np.unique(term_of_word.astype(np.int64) * max(n_docs, 1) + doc_of_word, return_counts=True)
+    term, doc = keys // max(n_docs, 1), keys % max(n_docs, 1)
+    tf = tf.astype('float32')
+
+    doc_length = np.bincount(doc_of_word, minlength=n_docs).astype('float32')
+    average_length = doc_length.mean() if n_docs else 1.0
+    doc_freq = np.bincount(term, minlength=len(terms))
+    idf = np.log1p((n_docs - doc_freq + 0.5) / (doc_freq + 0.5)).astype('float32')
+    norm = SEARCH_K1 * (1 - SEARCH_B + SEARCH_B * doc_length[doc] / max(average_length, 1e-9))
+    offsets = np.zeros(len(terms) + 1, dtype='int64')
+    np.cumsum(doc_freq, out=offsets[1:])
+    return {
+        'terms': terms,
+        'offsets': offsets,
+        'docs': doc.astype('int32'),
+        'weights': (idf[term] * tf * (SEARCH_K1 + 1) / (tf + norm)).astype('float32'),
+        'n_docs': n_docs
+    }
+
+def _search_index_path(fingerprint):
+    return os.path.join(CACHE_DIR, f"search-{fingerprint}-v{SEARCH_VERSION}.npz")
+
+def read_search_index(path):
+    """A persisted search index, or None"""
+    try:
+        with np.load(path) as saved:
+            index = {name: saved[name] for name in ('offsets', 'docs', 'weights')}
+            terms = bytes(saved['terms']).decode().split('\n') if len(saved['terms']) else []
+            index['terms'] = np.array(terms, dtype=object)
+            index['n_docs'] = int(saved['n_docs'])
+    except (OSError, KeyError, ValueError):
+        return None
+    return index
+
+def write_search_index(path, index):
+    """Persist a search index next to the listings store it was built from"""
+    try:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=CACHE_DIR, prefix='search-', suffix='.tmp')
+    except OSError:
+        return
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            # terms never contain a newline (they are runs of letters and digits)
+            np.savez(
+                f, offsets=index['offsets'], docs=index['docs'], weights=index['weights'],
+                terms=np.frombuffer('\n'.join(index['terms']).encode(), dtype=np.uint8),
+                n_docs=index['n_docs']
+            )
+        os.replace(tmp_path, path)
+    except OSError:
+        _remove_quietly(tmp_path)
+
+def search_listings(index, words):
+    """Positions (ascending) of the listings that have, for every query word,
+    a term starting with it (equal to it for short words), and their summed
+    BM25 scores"""
+    n_docs = index['n_docs']
+    scores = np.zeros(n_docs)
+    matched = np.ones(n_docs, dtype=bool)
+    for word in words:
+        if len(word) >= SEARCH_MIN_PREFIX:
+            low, high = np.searchsorted(index['terms'], [word, word + '\uffff'])
+        else:
+            low, high = np.searchsorted(index['terms'], word, 'left'), np.searchsorted(index['terms'], word, 'right')
+        start, end = index['offsets'][low], index['offsets'][high]
+        word_scores = np.bincount(index['docs'][start:end], weights=index['weights'][start:end], minlength=n_docs)
+        matched &= word_scores > 0
+        scores += word_scores
+    positions = np.flatnonzero(matched)
+    return positions, scores[positions]
+
+def cached_search_result(cache, df, filter_result, index, words):
+    """filter_result narrowed to the listings matching the search words, with
+    their scores aligned to positions; memoized in cache like a filter result"""
+    key = (filter_result['key'], 'search', words)
+    result = lru_lookup(cache, key)
+    if result is not None:
+        return result
+    matches = lru_lookup(cache, ('search', words))
+    if matches is None:
+        matches = search_listings(index, words)
+        lru_store(cache, ('search', words), matches, matches[0].nbytes + matches[1].nbytes)
+    positions, scores = matches
+    if filter_result['positions'] is not None:
+        in_filter = np.zeros(len(df), dtype=bool)
+        in_filter[filter_result['positions']] = True
+        keep = in_filter[positions]
+        positions, scores = positions[keep], scores[keep]
+    positions.setflags(write=False)
+    result = {
+        'key': key,
+        'digest': listing_set_digest(df['id'].to_numpy()[positions]),
+        'positions': positions,
+        'scores': scores,
+        'selectivity': {**filter_result['selectivity'], 'search': len(matches[0]) / len(df) if len(df) else 0.0},
+        'stats': summary_stats(df[['price', 'area']].iloc[positions])
+    }
+    return lru_store(cache, key, result, positions.nbytes + scores.nbytes)
+
+# Server-side clustering: listings are bucketed into square cells of
+# CLUSTER_CELL_PX screen pixels, one grid per zoom level. Cells nest (a cell
+# is 2x2 cells of the next zoom), so one Z-order sort at CLUSTER_MAX_ZOOM
+# makes every cell at every zoom a contiguous run of the sorted listings.
+CLUSTER_MAX_ZOOM = 16
+CLUSTER_CELL_PX = 64
+CLUSTER_BITS = CLUSTER_MAX_ZOOM + int(math.log2(256 // CLUSTER_CELL_PX))
+CLUSTER_CACHE_ENTRIES = 512
+CLUSTER_CACHE_BYTES = 64 * 1024 * 1024
+
+def build_cluster_grid(df):
+    """Listings sorted by the Z-order code of their finest cluster cell"""
+    lat = np.nan_to_num(df['lat'].to_numpy(dtype='float64'))
+    lng = np.nan_to_num(df['lng'].to_numpy(dtype='float64'))
+    # Web Mercator, as used by Leaflet tiles, scaled to [0, 1)
+    x = (lng + 180.0) / 360.0
+    y = (1.0 - np.arcsinh(np.tan(np.radians(np.clip(lat, -85.05, 85.05)))) / np.pi) / 2.0
+    side = 1 << CLUSTER_BITS
+    ix = np.clip((x * side).astype(np.int64), 0, side - 1).astype(np.uint64)
+    iy = np.clip((y * side).astype(np.int64), 0, side - 1).astype(np.uint64)
+    codes = _spread_bits(ix) | (_spread_bits(iy) << np.uint64(1))
+    order = np.argsort(codes, kind='stable')
+    rank = np.empty(len(order), dtype=np.int64)
+    rank[order] = np.arange(len(order))
+    # prices as ranks into one sorted table, so per-cluster medians need
+    # only a plain integer sort
+    price = df['price'].to_numpy(dtype='float64')[order]
+    by_price = np.argsort(price, kind='stable')
+    price_rank = np.empty(len(order), dtype=np.int64)
+    price_rank[by_price] = np.arange(len(order))
+    return {
+        'codes': codes[order],
+        'order': order,
+        'rank': rank,
+        'lat': lat[order],
+        'lng': lng[order],
+        'price_rank': price_rank,
+        'sorted_price': price[by_price]
+    }
+
+def _spread_bits(values):
+    """Interleave zero bits into 32-bit integers (for Z-order codes)"""
+    values = values & np.uint64(0xFFFFFFFF)
+    for shift, mask in ((16, 0x0000FFFF0000FFFF), (8, 0x00FF00FF00FF00FF),
+                        (4, 0x0F0F0F0F0F0F0F0F), (2, 0x3333333333333333),
+                        (1, 0x5555555555555555)):
+        values = (values | (values << np.uint64(shift))) & np.uint64(mask)
+    return values
+
+def cluster_level(grid, positions, zoom):
+    """Clusters of the selected listings at one zoom level.
+
+    positions are the selected rows of the frame the grid was built from
+    (None: all rows, in order). Returns per-cluster centroid, count and
+    median price, with each cluster's members as a run of 'members' (indices
+    into the selection) starting at 'starts'.
+    """
+    size = len(grid['order'])
+    if positions is None:
+        ranks = np.arange(size)
+    elif len(positions) * 16 < size:
+        ranks = np.sort(grid['rank'][positions])
+    else:
+        selected = np.zeros(size, dtype=bool)
+        selected[grid['rank'][positions]] = True
+        ranks = np.flatnonzero(selected)
+    shift = np.uint64(2 * (CLUSTER_MAX_ZOOM - min(max(int(zoom), 0), CLUSTER_MAX_ZOOM)))
+    cells = grid['codes'][ranks] >> shift
+    starts = np.flatnonzero(np.r_[True, cells[1:] != cells[:-1]]) if len(cells) else np.zeros(0, dtype=np.int64)
+    counts = np.diff(np.r_[starts, len(cells)])
+    members = grid['order'][ranks]
+    if positions is not None:
+        slot = np.empty(size, dtype=np.int64)
+        slot[positions] = np.arange(len(positions))
+        members = slot[members]
+    # sort (cluster, price rank) pairs to read off each cluster's median
+    keys = np.repeat(np.arange(len(starts), dtype=np.int64), counts) << 32 | grid['price_rank'][ranks]
+    prices = grid['sorted_price'][np.sort(keys) & 0xFFFFFFFF]
+    with np.errstate(invalid='ignore'):
+        return {
+            'members': members,
+            'starts': starts,
+            'counts': counts,
+            'lat': np.add.reduceat(grid['lat'][ranks], starts) / counts if len(starts) else np.zeros(0),
+            'lng': np.add.reduceat(grid['lng'][ranks], starts) / counts if len(starts) else np.zeros(0),
+            'median_price': (prices[starts + (counts - 1) // 2] + prices[starts + counts // 2]) / 2
+        }
+
+# Heatmap and district layers are drawn from tables keyed once at load time
+# (heatmap grid cell and district of every listing); a filter selection
+# only re-aggregates them, so the layers hold one point per cell/district
+HEATMAP_ZOOM = 14
+
+def build_map_tables(df, grid):
+    """Grid cell and district keys per listing, with fixed cell and district centres"""
+    codes = grid['codes'][grid['rank']] >> np.uint64(2 * (CLUSTER_MAX_ZOOM - HEATMAP_ZOOM))
+    cell, _ = pd.factorize(codes)
+    district, districts = pd.factorize(df['district'])
+    lat = df['lat'].to_numpy(dtype='float64')
+    lng = df['lng'].to_numpy(dtype='float64')
+    price = df['price'].to_numpy(dtype='float64')
+    area = df['area'].to_numpy(dtype='float64')
+    with np.errstate(divide='ignore', invalid='ignore'):
+        price_per_m2 = np.where(area > 0, price / area, np.nan)
+    cell_counts = np.bincount(cell)
+    known = district >= 0
+    district_counts = np.bincount(district[known], minlength=len(districts))
+    with np.errstate(invalid='ignore'):
+        return {
+            'cell': cell,
+            'cell_lat': np.bincount(cell, weights=lat) / cell_counts,
+            'cell_lng': np.bincount(cell, weights=lng) / cell_counts,
+            'district': district,
+            'districts': np.asarray(districts, dtype=object),
+            'district_lat': np.bincount(district[known], weights=lat[known], minlength=len(districts)) / district_counts,
+            'district_lng': np.bincount(district[known], weights=lng[known], minlength=len(districts)) / district_counts,
+            'price': price,
+            'price_per_m2': price_per_m2
+        }
+
+def map_aggregates(tables, positions):
+    """Heatmap cells (mean price per m²) and district medians for a selection"""
+    rows = slice(None) if positions is None else positions
+    cell = tables['cell'][rows]
+    price_per_m2 = tables['price_per_m2'][rows]
+    valid = ~np.isnan(price_per_m2)
+    cells = len(tables['cell_lat'])
+    counts = np.bincount(cell[valid], minlength=cells)
+    sums = np.bincount(cell[valid], weights=price_per_m2[valid], minlength=cells)
+    occupied = np.flatnonzero(counts)
+    district = tables['district'][rows]
+    known = district >= 0
+    by_district = pd.Series(tables['price'][rows][known]).groupby(district[known]).agg(['size', 'median'])
+    codes = by_district.index.to_numpy()
+    return {
+        'heat': {
+            'lat': tables['cell_lat'][occupied],
+            'lng': tables['cell_lng'][occupied],
+            'price_per_m2': sums[occupied] / counts[occupied],
+            'count': counts[occupied]
+        },
+        'districts': {
+            'name': tables['districts'][codes],
+            'lat': tables['district_lat'][codes],
+            'lng': tables['district_lng'][codes],
+            'count': by_district['size'].to_numpy(),
+            'median_price': by_district['median'].to_numpy()
+        }
+    }
+
+def cached_map_aggregates(cache, tables, filter_key, positions):
+    aggregates = lru_lookup(cache, filter_key)
+    if aggregates is None:
+        aggregates = map_aggregates(tables, positions)
+        nbytes = sum(values.nbytes for part in aggregates.values() for values in part.values())
+        lru_store(cache, filter_key, aggregates, nbytes)
+    return aggregates
+
+def add_price_heatmap(m, heat):
+    """HeatMap of the grid cells, weighted by their mean price per m²"""
+    if len(heat['price_per_m2']) == 0:
+        return
+    weights = heat['price_per_m2'] / heat['price_per_m2'].max()
+    plugins.HeatMap(
+        np.column_stack([heat['lat'], heat['lng'], weights]).tolist(),
+        name=t('map_layer_heatmap'),
+        radius=25,
+        blur=20,
+        min_opacity=0.3
+    ).add_to(m)
+
+def add_district_layer(m, districts):
+    """One circle per district, coloured by median price and sized by listing count.
+
+    There are no district boundaries in the data, so this stands in for a
+    choropleth.
+    """
+    if len(districts['count']) == 0:
+        return
+    low, high = districts['median_price'].min(), districts['median_price'].max()
+    colormap = folium.LinearColormap(
+        ['#2b83ba', '#abdda4', '#ffffbf', '#fdae61', '#d7191c'],
+        vmin=low,
+        vmax=high if high > low else low + 1,
+        caption=f"{t('median_price')} (₮)"
+    )
+    largest = districts['count'].max()
+    for name, lat, lng, count, median in zip(districts['name'], districts['lat'], districts['lng'],
+                                             districts['count'], districts['median_price']):
+        folium.CircleMarker(
+            location=[lat, lng],
+            radius=12 + 28 * math.sqrt(count / largest),
+            color='white',
+            weight=2,
+            fill=True,
+            fill_color=colormap(median),
+            fill_opacity=0.75,
+            tooltip=f"{name} {t('district')}: {count} {t('properties')} • {t('median_price')}: {format_price(median, st.session_state.language)}"
+        ).add_to(m)
+    colormap.add_to(m)
+
+def cached_cluster_level(cache, grid, filter_key, positions, zoom):
+    key = (filter_key, int(zoom))
+    clusters = lru_lookup(cache, key)
+    if clusters is None:
+        clusters = cluster_level(grid, positions, zoom)
+        lru_store(cache, key, clusters, sum(values.nbytes for values in clusters.values()))
+    return clusters
+
+# Listing photos are downloaded in the background by a small thread pool,
+# shrunk to thumbnails and stored content-addressed (the file name is the
+# digest of the thumbnail) under THUMB_DIR. Cards embed the local copy once it
+# exists and point at the CDN until then.
+THUMB_DIR = os.path.join(CACHE_DIR, 'thumbs')
+THUMB_SIZE = (360, 240)
+THUMB_QUALITY = 70
+THUMB_WORKERS = 8
+# photos waiting for a worker; further requests are dropped until a later rerun
+THUMB_QUEUE = 256
+THUMB_TIMEOUT = 10
+THUMB_MAX_SOURCE_BYTES = 16 * 1024 * 1024
+THUMB_RETRY_SECONDS = 600
+# photos whose last fetch failed, each retried after THUMB_RETRY_SECONDS
+THUMB_FAILED_ENTRIES = 4096
+THUMB_FAILED_BYTES = 4 * 1024 * 1024
+THUMB_CACHE_ENTRIES = 20000
+THUMB_CACHE_BYTES = 256 * 1024 * 1024
+
+def new_thumbnail_store(directory=THUMB_DIR, max_entries=THUMB_CACHE_ENTRIES,
+                        max_bytes=THUMB_CACHE_BYTES, workers=THUMB_WORKERS, timeout=THUMB_TIMEOUT,
+                        failed_entries=THUMB_FAILED_ENTRIES):
+    """Thumbnail cache in directory, picking up the thumbnails an earlier run left there.
+
+    The index is an LRU from photo URL to thumbnail digest, one ref file per
+    URL on disk. Evicting a URL deletes its ref file, and the thumbnail once no
+    other URL refers to it. A thumbnail shared by several URLs counts against
+    max_bytes once per URL, so the cap errs on the small side.
+    """
+    store = {
+        'dir': directory,
+        'refs': {},  # digest -> number of indexed URLs using it
+        'pending': set(),
+        # url -> time of its last failed fetch
+        'failed': new_lru_cache(failed_entries, THUMB_FAILED_BYTES),
+        'timeout': timeout,
+        'lock': threading.Lock(),
+        'executor': ThreadPoolExecutor(max_workers=workers, thread_name_prefix='thumbnails')
+    }
+    store['index'] = new_lru_cache(
+        max_entries, max_bytes,
+        on_evict=lambda url, digest: _drop_thumbnail_ref(store, url, digest)
+    )
+    _load_thumbnail_refs(store)
+    return store
+
+def _thumbnail_path(store, digest):
+    return os.path.join(store['dir'], f'{digest}.webp')
+
+def _thumbnail_ref_path(store, url):
+    return os.path.join(store['dir'], hashlib.blake2b(url.encode(), digest_size=16).hexdigest() + '.ref')
+
+def _load_thumbnail_refs(store):
+    """Index the ref files in the store directory, oldest first so the LRU
+    order survives restarts, and delete thumbnails nothing refers to"""
+    try:
+        os.makedirs(store['dir'], exist_ok=True)
+        names = os.listdir(store['dir'])
+    except OSError:
+        return
+    refs = [os.path.join(store['dir'], name) for name in names if name.endswith('.ref')]
+    for path in sorted(refs, key=_mtime_or_zero):
+        try:
+            with open(path, encoding='utf-8') as f:
+                digest, url = f.read().split('\n', 1)
+            nbytes = os.path.getsize(_thumbnail_path(store, digest))
+        except (OSError, ValueError):
+            _remove_quietly(path)
+            continue
+        store['refs'][digest] = store['refs'].get(digest, 0) + 1
+        lru_store(store['index'], url, digest, nbytes)
+    for name in names:
+        if name.endswith('.tmp') or (name.endswith('.webp') and name[:-5] not in store['refs']):
+            _remove_quietly(os.path.join(store['dir'], name))
+
+def _drop_thumbnail_ref(store, url, digest):
+    with store['lock']:
+        _remove_quietly(_thumbnail_ref_path(store, url))
+        store['refs'][digest] -= 1
+        if store['refs'][digest] == 0:
+            del store['refs'][digest]
+            _remove_quietly(_thumbnail_path(store, digest))
+
+def _write_atomically(path, data):
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    except OSError:
+        _remove_quietly(tmp_path)
+        raise
+
+def fetch_photo(url, timeout=THUMB_TIMEOUT):
+    """Raw bytes of a listing photo"""
+    request = urllib.request.Request(url, headers={'User-Agent': 'Mozilla/5.0'})
+    with urllib.request.urlopen(request, timeout=timeout) as response:
+        data = response.read(THUMB_MAX_SOURCE_BYTES + 1)
+    if len(data) > THUMB_MAX_SOURCE_BYTES:
+        raise ValueError(f'photo larger than {THUMB_MAX_SOURCE_BYTES} bytes: {url}')
+    return data
+
+def make_thumbnail(data):
+    """WebP thumbnail that fits THUMB_SIZE, keeping the aspect ratio"""
+    with Image.open(io.BytesIO(data)) as image:
+        # JPEG sources decode straight at a reduced scale
+        image.draft('RGB', THUMB_SIZE)
+        thumbnail = image.convert('RGB')
+    thumbnail.thumbnail(THUMB_SIZE)
+    out = io.BytesIO()
+    thumbnail.save(out, 'WEBP', quality=THUMB_QUALITY)
+    return out.getvalue()
+
+def _fetch_thumbnail(store, url):
+    try:
+        thumbnail = make_thumbnail(fetch_photo(url, store['timeout']))
+        digest = hashlib.blake2b(thumbnail, digest_size=16).hexdigest()
+        with store['lock']:
+            if digest not in store['refs']:
+                _write_atomically(_thumbnail_path(store, digest), thumbnail)
+            _write_atomically(_thumbnail_ref_path(store, url), f'{digest}\n{url}'.encode())
+            store['refs'][digest] = store['refs'].get(digest, 0) + 1
+        # outside the store lock: evictions take it to delete files
+        lru_store(store['index'], url, digest, len(thumbnail))
+        lru_discard(store['failed'], url)
+    except Exception:
+        # lru_store keeps an existing entry, so a repeated failure replaces it
+        lru_discard(store['failed'], url)
+        lru_store(store['failed'], url, time.time(), len(url))
+    finally:
+        with store['lock']:
+            store['pending'].discard(url)
+
+def request_thumbnails(store, urls):
+    """Queue background fetches for the photos that are not cached, queued or
+    recently failed"""
+    if Image is None:
+        return
+    now = time.time()
+    with store['lock']:
+        for url in urls:
+            if not url or url == 'nan' or url in store['pending']:
+                continue
+            failed_at = lru_lookup(store['failed'], url)
+            if failed_at is not None and now - failed_at < THUMB_RETRY_SECONDS:
+                continue
+            with store['index']['lock']:
+                if url in store['index']['entries']:
+                    continue
+            if len(store['pending']) >= THUMB_QUEUE:
+                break
+            store['pending'].add(url)
+            store['executor'].submit(_fetch_thumbnail, store, url)
+
+def thumbnail_src(store, url):
+    """Image src for a listing photo and whether it may still change: the local
+    thumbnail as a data URI, else the CDN URL (while it is queued, or for good
+    after a failed fetch)"""
+    digest = lru_lookup(store['index'], url)
+    if digest is not None:
+        try:
+            with open(_thumbnail_path(store, digest), 'rb') as f:
+                return 'data:image/webp;base64,' + base64.b64encode(f.read()).decode(), False
+        except OSError:
+            pass  # evicted since the lookup
+    with store['lock']:
+        return url, url in store['pending']
+
+def listing_image_src(store, row):
+    """thumbnail_src for a listing row, or (None, False) if it has no photo"""
+    if not row['image_url'] or row['image_url'] == 'nan':
+        return None, False
+    return thumbnail_src(store, row['image_url'])
+
+def photo_gallery_html(row, strip_attrs="class='property-gallery'", image_attrs=''):
+    """The listing's further photos in a collapsed, horizontally scrolling strip.
+
+    Closed <details> content is not rendered, so nothing is fetched until the
+    strip is opened; lazy loading then fetches photos as they scroll into view.
+    """
+    urls = str(row['image_urls']).split('\n')[1:]
+    if not urls:
+        return ''
+    images = ''.join(f"<img src='{html.escape(url)}' loading='lazy' alt='' {image_attrs}>" for url in urls)
+    return f"<details><summary>📷 +{len(urls)} {t('photos')}</summary><div {strip_attrs}>{images}</div></details>"
+
+def listing_popup_html(row, image_src=None):
+    """Full detail card of one listing, as shown in its map popup.
+
+    image_src replaces the CDN photo URL, e.g. with a cached thumbnail.
+    Scraped text is escaped, as in property_card_html.
+    """
+    def text(value):
+        return html.escape(str(value))
+
+    # make title clickable if link exists
+    if row['link'] and row['link'] != 'nan':
+        title_html = f"<a href='{text(row['link'])}' target='_blank' style='color:#1e40af;text-decoration:none;'>{text(row['title'])}</a>"
+    else:
+        title_html = text(row['title'])
+
+    popup_html = f"""
+    <div style="width: 350px; font-family: Arial;">
+        <h3 style="margin: 0 0 12px 0; color: #1e40af; font-size: 16px;">{title_html}</h3>
+    """
+    image_src = image_src or row['image_url']
+    if image_src and image_src != 'nan':
+        popup_html += f"""
+        <div style="margin-bottom: 12px;">
+            <img src="{text(image_src)}"
+                 style="width: 100%; height: 200px; object-fit: cover; border-radius: 8px;"
+                 onerror="this.parentElement.style.display='none'">
+        </div>
+        """
+        popup_html += photo_gallery_html(
+            row,
+            "style='display:flex;gap:6px;overflow-x:auto;scroll-snap-type:x mandatory;margin-bottom:12px;'",
+            "style='flex:none;height:90px;border-radius:6px;scroll-snap-align:start;'"
+        )
+    popup_html += f"""
+        <div style="background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
+                    padding: 12px; border-radius: 8px; margin-bottom: 12px; text-align: center;">
+            <div style="font-size: 28px; font-weight: bold; color: white;">
+                {format_price(row['price'], st.session_state.language)}
+            </div>
+    """
+    if st.session_state.language == 'mn':
+        usd_price = row['price'] / 3400
+        popup_html += f"""
+            <div style="font-size: 14px; color: rgba(255,255,255,0.9); margin-top: 4px;">
+                ≈ ${usd_price:,.0f} USD
+            </div>
+        """
+    else:
+        mnt_millions = row['price'] / 1_000_000
+        popup_html += f"""
+            <div style="font-size: 14px; color: rgba(255,255,255,0.9); margin-top: 4px;">
+                ≈ ₮{mnt_millions:.0f}M MNT
+            </div>
+        """
+    popup_html += "</div>"
+
+    popup_html += f"""
+        <div style="display: grid; grid-template-columns: 1fr 1fr; gap: 8px; margin-bottom: 12px;">
+            <div style="background: #f3f4f6; padding: 8px; border-radius: 6px; text-align: center;">
+                <div style="font-size: 11px; color: #6b7280;">📐 {t('area')}</div>
+                <div style="font-size: 18px; font-weight: bold; color: #1f2937;">{row['area']:.0f}m²</div>
+            </div>
+            <div style="background: #f3f4f6; padding: 8px; border-radius: 6px; text-align: center;">
+                <div style="font-size: 11px; color: #6b7280;">🏢 {t('floor')}</div>
+                <div style="font-size: 18px; font-weight: bold; color: #1f2937;">{text(row['floor'])}/{text(row['building_floor'])}</div>
+            </div>
+        </div>
+    """
+
+    popup_html += f"""
+        <div style="font-size: 13px; margin-bottom: 10px; padding: 10px; background: #fef3c7; border-radius: 6px;">
+            <strong>📍 {t('location')}:</strong><br>
+            {text(row['location'])}<br>
+            <span style="color: #92400e; font-weight: 600;">{text(row['district'])} {t('district')}</span>
+        </div>
+    """
+
+    features = []
+    if 'balcony_count' in row and row['balcony_count'] not in (None, 'nan'):
+        try:
+            bc = int(float(row['balcony_count']))
+            features.append(f"🌿 {t('balcony_count')}: {bc}")
+        except Exception:
+            pass
+    elif has_feature(row['balcony']):
+        features.append(f"🌿 {t('balcony')}: {text(row['balcony'])}")
+    if row['has_elevator']:
+        features.append(f"⬆️ {t('elevator')}: {text(row['elevator'])}")
+    if row['has_garage']:
+        features.append(f"🚗 {t('garage')}: {text(row['garage'])}")
+    if row['year'] and row['year'] != 'nan':
+        features.append(f"📅 {t('year')}: {text(row['year'])}")
+    if row['window_count'] and row['window_count'] != 'nan':
+        features.append(f"🪟 {t('window_count')}: {text(row['window_count'])}")
+
+    if features:
+        popup_html += f"""
+        <div style="font-size: 12px; margin-bottom: 10px; padding: 10px; background: #dbeafe; border-radius: 6px;">
+            <strong>{t('features')}:</strong><br>
+            {' • '.join(features)}
+        </div>
+        """
+
+    if row['description'] and row['description'] != 'nan' and len(row['description']) > 10:
+        popup_html += f"""
+        <div style="font-size: 12px; margin-bottom: 10px; padding: 8px; background: #f9fafb;
+                    border-left: 3px solid #3b82f6; max-height: 80px; overflow-y: auto;">
+            {text(row['description'])}
+        </div>
+        """
+
+    meta_items = []
+    if row['date'] and row['date'] != 'nan':
+        meta_items.append(f"📅 {text(row['date'])}")
+    if row['views'] and row['views'] != 'nan':
+        meta_items.append(f"👁️ {text(row['views'])} {t('views')}")
+
+    if meta_items:
+        popup_html += f"""
+        <div style="font-size: 11px; color: #6b7280; margin-bottom: 10px; padding: 8px; background: #f3f4f6; border-radius: 6px;">
+            {' • '.join(meta_items)}
+        </div>
+        """
+
+    if row['link'] and row['link'] != 'nan':
+        popup_html += f"""
+        <a href="{text(row['link'])}" target="_blank"
+           style="display: block; background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
+                  color: white; padding: 12px; border-radius: 8px; text-decoration: none;
+                  font-size: 14px; text-align: center; font-weight: bold; box-shadow: 0 4px 6px rgba(0,0,0,0.1);">
+            {t('view_on')} →
+        </a>
+        """
+
+    popup_html += "</div>"
+    return popup_html
+
+def add_listing_marker(layer, row, popup_html):
+    """Add one listing's marker to a map layer"""
+    folium.Marker(
+        location=[row['lat'], row['lng']],
+        popup=folium.Popup(popup_html, max_width=350),
+        tooltip=f"{html.escape(str(row['title']))} - {format_price(row['price'], st.session_state.language)}",
+        icon=folium.Icon(
+            color=get_marker_color(row['price']),
+            icon='home',
+            prefix='fa'
+        )
+    ).add_to(layer)
+
+# Viewport mode popups carry only the listing id (the tooltip has title and
+# price); clicking one reruns the script, which shows the full card under the map
+POPUP_CACHE_ENTRIES = 4096
+POPUP_CACHE_BYTES = 32 * 1024 * 1024
+POPUP_ID_PATTERN = re.compile(r'#(-?\d+)\s*$')
+
+def listing_popup_stub(row):
+    return (
+        f"<div style='font-family: Arial; font-size: 12px; color: #6b7280;'>"
+        f"{t('popup_details_below')}<br>#{row['id']}</div>"
+    )
+
+def clicked_listing_id(popup_text):
+    """Listing id from the text of a clicked stub popup, or None"""
+    match = POPUP_ID_PATTERN.search(popup_text or '')
+    return int(match.group(1)) if match else None
+
+def cached_popup_html(cache, thumbnails, row, lang):
+    key = (int(row['id']), lang)
+    popup_html = lru_lookup(cache, key)
+    if popup_html is None:
+        request_thumbnails(thumbnails, [row['image_url']])
+        image_src, pending = listing_image_src(thumbnails, row)
+        popup_html = listing_popup_html(row, image_src)
+        # rebuilt with the local thumbnail once it has arrived
+        if not pending:
+            lru_store(cache, key, popup_html, len(popup_html))
+    return popup_html
+
+# Without viewport mode, result sets above this size are sent as one
+# FastMarkerCluster data array instead of a folium.Marker per listing
+MAP_BULK_THRESHOLD = 1000
+
+def bulk_marker_layer(listings):
+    """All listings as one FastMarkerCluster, markers built in the browser.
+
+    Each data row is [lat, lng, color, id, tooltip]; the JS callback draws
+    a circle in the get_marker_color bucket with a stub popup (see
+    listing_popup_stub), so no per-listing Python objects are created.
+    """
+    # Leaflet shows tooltips as HTML
+    tooltips = listings['title'].astype(str).map(html.escape) + ' - ' + format_price_series(listings['price'], st.session_state.language)
+    data = list(zip(
+        # 5 decimals is about a metre
+        listings['lat'].to_numpy(dtype='float64').round(5).tolist(),
+        listings['lng'].to_numpy(dtype='float64').round(5).tolist(),
+        marker_colors(listings['price']).tolist(),
+        listings['id'].tolist(),
+        tooltips.tolist()
+    ))
+    # the popup content is a DOM element, which st_folium reads clicks from
+    callback = f"""
+    var callback = function (row) {{
+        var marker = L.circleMarker(new L.LatLng(row[0], row[1]), {{
+            radius: 8, color: 'white', weight: 2, fillColor: row[2], fillOpacity: 0.9
+        }});
+        var popup = document.createElement('div');
+        popup.style.cssText = 'font-family: Arial; font-size: 12px; color: #6b7280;';
+        popup.innerHTML = {json.dumps(t('popup_details_below'))} + '<br>#' + row[3];
+        marker.bindPopup(popup);
+        marker.bindTooltip(row[4], {{sticky: true}});
+        return marker;
+    }};
+    """
+    return plugins.FastMarkerCluster(data, callback=callback, name="Properties")
+
+# Viewport mode: at most this many listing markers are sent to the browser
+MAP_MARKER_LIMIT = 400
+
+def viewport_mask(listings, bounds):
+    """Listings (or clusters) inside Leaflet map bounds; all of them while bounds are unknown"""
+    lat = np.asarray(listings['lat'], dtype='float64')
+    lng = np.asarray(listings['lng'], dtype='float64')
+    if not bounds or not bounds.get('_southWest') or bounds['_southWest'].get('lat') is None:
+        return np.ones(len(lat), dtype=bool)
+    south_west, north_east = bounds['_southWest'], bounds['_northEast']
+    return (
+        (lat >= south_west['lat']) & (lat <= north_east['lat']) &
+        (lng >= south_west['lng']) & (lng <= north_east['lng'])
+    )
+
+def district_aggregates(listings):
+    """Count, centroid and median price of the listings in each district"""
+    return listings.groupby('district', observed=True).agg(
+        count=('id', 'size'),
+        lat=('lat', 'mean'),
+        lng=('lng', 'mean'),
+        median_price=('price', 'median')
+    ).reset_index()
+
+def add_aggregate_marker(layer, lat, lng, count, label):
+    """Add a count bubble standing in for several listings"""
+    size = int(min(72, 28 + 12 * math.log10(max(count, 1))))
+    folium.Marker(
+        location=[lat, lng],
+        tooltip=label,
+        icon=folium.DivIcon(
+            html=f"""<div style="width: {size}px; height: {size}px; line-height: {size}px;
+                        border-radius: 50%; text-align: center; font-weight: bold; color: white;
+                        background: rgba(102, 126, 234, 0.85); border: 2px solid white;
+                        box-shadow: 0 2px 6px rgba(0,0,0,0.3);">{count}</div>""",
+            icon_size=(size, size),
+            icon_anchor=(size // 2, size // 2)
+        )
+    ).add_to(layer)
+
+def viewport_layer(listings, bounds, clusters=None):
+    """Feature group for the current viewport.
+
+    With clusters for the current zoom (see cluster_level), the clusters
+    around the viewport are sent as count bubbles, or as a plain marker when
+    they hold a single listing. Without them, listings inside the bounds get
+    their own markers, unless more than MAP_MARKER_LIMIT are in view. Listings
+    not shown either way are summarized by one bubble per district, so the
+    payload never grows with the dataset. Returns the layer and the number of
+    listings in view.
+    """
+    layer = folium.FeatureGroup(name="Properties")
+    inside = viewport_mask(listings, bounds)
+    in_view = int(inside.sum())
+    if clusters is not None:
+        near = viewport_mask(clusters, _padded_bounds(bounds))
+        for cluster in np.flatnonzero(near):
+            start, count = clusters['starts'][cluster], clusters['counts'][cluster]
+            if count == 1:
+                row = listings.iloc[clusters['members'][start]]
+                add_listing_marker(layer, row, listing_popup_stub(row))
+            else:
+                add_aggregate_marker(
+                    layer, clusters['lat'][cluster], clusters['lng'][cluster], int(count),
+                    f"{count} {t('properties')} • {format_price(clusters['median_price'][cluster], st.session_state.language)}"
+                )
+        summarized = listings.iloc[np.sort(clusters['members'][np.repeat(~near, clusters['counts'])])]
+    elif in_view <= MAP_MARKER_LIMIT:
+        for _, row in listings.iloc[np.flatnonzero(inside)].iterrows():
+            add_listing_marker(layer, row, listing_popup_stub(row))
+        summarized = listings.iloc[np.flatnonzero(~inside)]
+    else:
+        summarized = listings
+    for agg in district_aggregates(summarized).itertuples(index=False):
+        add_aggregate_marker(
+            layer, agg.lat, agg.lng, agg.count,
+            f"{agg.district}: {agg.count} {t('properties')} • {format_price(agg.median_price, st.session_state.language)}"
+        )
+    return layer, in_view
+
+def _padded_bounds(bounds, margin=0.5):
+    """Bounds grown by margin times their size on every side, so a short pan stays covered"""
+    if not bounds or not bounds.get('_southWest') or bounds['_southWest'].get('lat') is None:
+        return bounds
+    south_west, north_east = bounds['_southWest'], bounds['_northEast']
+    pad_lat = (north_east['lat'] - south_west['lat']) * margin
+    pad_lng = (north_east['lng'] - south_west['lng']) * margin
+    return {
+        '_southWest': {'lat': south_west['lat'] - pad_lat, 'lng': south_west['lng'] - pad_lng},
+        '_northEast': {'lat': north_east['lat'] + pad_lat, 'lng': north_east['lng'] + pad_lng}
+    }
+
+# Rendered maps are reused across reruns (mortgage inputs, paging, popup
+# clicks) until the filtered listings, language or map settings change.
+# Each session keeps its own: st_folium re-parents and re-renders the folium
+# objects it is given, so two sessions must never hold the same ones
+MAP_CACHE_ENTRIES = 8
+MAP_CACHE_BYTES = 64 * 1024 * 1024
+# rough serialized size of one marker, for the cache's memory cap
+MAP_BYTES_PER_MARKER = 4096
+
+def listings_base_map(show_legend=True):
+    """Empty Ulaanbaatar map, with the marker price legend if asked for"""
+    m = folium.Map(
+        location=[47.9184, 106.9177],
+        zoom_start=11,
+        tiles='OpenStreetMap'
+    )
+    if show_legend:
+        legend_html = f"""
+        <div style="position: fixed;
+                    bottom: 50px; right: 50px;
+                    background: white;
+                    padding: 15px;
+                    border-radius: 10px;
+                    box-shadow: 0 4px 6px rgba(0,0,0,0.1);
+                    z-index: 1000;
+                    font-family: Arial;">
+            <h4 style="margin: 0 0 10px 0; font-size: 14px;">{t('price_legend')}</h4>
+            <div style="font-size: 12px;">
+                <div style="margin: 5px 0;">
+                    <span style="color: green; font-size: 16px;">●</span> < ₮200 {t('million')}
+                </div>
+                <div style="margin: 5px 0;">
+                    <span style="color: blue; font-size: 16px;">●</span> ₮200-400 {t('million')}
+                </div>
+                <div style="margin: 5px 0;">
+                    <span style="color: orange; font-size: 16px;">●</span> ₮400-600 {t('million')}
+                </div>
+                <div style="margin: 5px 0%;">
+                    <span style="color: red; font-size: 16px;">●</span> > ₮600 {t('million')}
+                </div>
+            </div>
+        </div>
+        """
+        m.get_root().html.add_child(folium.Element(legend_html))
+    return m
+
+# Mortgage terms for many listings at once. As in the calculator, the whole
+# monthly budget goes to the loan until it is paid off.
+def mortgage_terms(prices, down_pct, rate_annual, monthly_budget, years):
+    """Loan, months to payoff, total paid (down payment included) and the
+    monthly payment that clears the loan in ``years``, in one NumPy pass.
+
+    Prices, down payment, rate and budget broadcast against each other, so this
+    covers every listing for one scenario as well as a grid of scenarios for
+    one price. Loans the budget never pays off (it does not cover the
+    interest) take ``inf`` months and cost ``inf``.
+    """
+    prices = np.asarray(prices, dtype='float64')
+    down = prices * (np.asarray(down_pct, dtype='float64') / 100)
+    loan = prices - down
+    r = np.asarray(rate_annual, dtype='float64') / 100 / 12
+    monthly_budget = np.asarray(monthly_budget, dtype='float64')
+    n = years * 12
+    with np.errstate(divide='ignore', invalid='ignore'):
+        growth = np.log1p(r)
+        # share of the budget eaten by the first month's interest
+        share = loan * r / monthly_budget
+        months = np.where(r > 0, -np.log1p(-share) / growth, loan / monthly_budget)
+        months = np.where((r > 0) & (share >= 1), np.inf, months)
+        months = np.where(loan <= 0, 0.0, months)
+        payment = np.where(r > 0, loan * r / -np.expm1(-n * growth), loan / n)
+        total_paid = np.where(np.isinf(months), np.inf, monthly_budget * months + down)
+    return {'loan': loan, 'months': months, 'total_paid': total_paid, 'payment': payment}
+
+def amortization_schedule(loan, rate_annual, payment):
+    """Yield (month, payment, interest, principal, balance) for each month until
+    the loan is paid off; nothing if payment never pays it off"""
+    r = rate_annual / 100 / 12
+    balance = float(loan)
+    if balance > 0 and payment <= balance * r:
+        return
+    month = 0
+    while balance > 0.005:
+        month += 1
+        interest = balance * r
+        principal = min(payment - interest, balance)
+        balance -= principal
+        yield month, interest + principal, interest, principal, balance
+
+# Scenario grid: payoff time of one price over ranges of rate, down payment
+# and budget, for comparing many mortgage offers at once
+SWEEP_MAX_STEPS = 100
+SWEEP_MAX_BUDGETS = 20
+SWEEP_CACHE_ENTRIES = 64
+SWEEP_CACHE_BYTES = 64 * 1024 * 1024
+# cell colors from short (green) to long (red) payoff times, in SWEEP_SHADES steps
+SWEEP_COLORS = np.array([[16, 185, 129], [251, 191, 36], [239, 68, 68]], dtype='float64')
+SWEEP_SHADES = 64
+
+def cached_mortgage_sweep(cache, price, rate_range, down_range, budget_range):
+    """Months to payoff for every (rate, down %, budget) combination; ranges are
+    (low, high, steps). One broadcast mortgage_terms call gives the whole
+    rates x downs x budgets array, memoized in cache by price and ranges.
+    A range with equal ends is a single step (the axes never repeat a value,
+    so their labels stay unique)."""
+    key = (float(price), rate_range, down_range, budget_range)
+    sweep = lru_lookup(cache, key)
+    if sweep is None:
+        rates, downs, budgets = (np.unique(np.linspace(low, high, int(steps))) for low, high, steps in key[1:])
+        months = mortgage_terms(price, downs[None, :, None], rates[:, None, None], budgets[None, None, :], 1)['months']
+        sweep = lru_store(
+            cache, key, {'rates': rates, 'downs': downs, 'budgets': budgets, 'months': months}, months.nbytes
+        )
+    return sweep
+
+def _percent_labels(values):
+    """Shortest ``12.5%`` labels that still tell the values apart"""
+    for decimals in range(4):
+        labels = [f"{value:.{decimals}f}%" for value in values]
+        if len(set(labels)) == len(labels):
+            return labels
+    return [f"{value}%" for value in values]
+
+def sweep_table(sweep, budget_slot):
+    """Rate x down payment table of payoff years at one budget, colored as a heatmap"""
+    years = sweep['months'][:, :, budget_slot] / 12
+    years = np.where(np.isinf(years), np.nan, years)
+    table = pd.DataFrame(
+        years,
+        index=_percent_labels(sweep['rates']),
+        columns=_percent_labels(sweep['downs'])
+    )
+    stops = np.linspace(0, len(SWEEP_COLORS) - 1, SWEEP_SHADES)
+    rgb = np.stack([np.interp(stops, np.arange(len(SWEEP_COLORS)), SWEEP_COLORS[:, c]) for c in range(3)], axis=-1)
+    # the last entry is for loans the budget never pays off
+    palette = np.array([f"background-color: #{r:02x}{g:02x}{b:02x}" for r, g, b in rgb.astype(int)] + [
+        'background-color: #e5e7eb'
+    ])
+    finite = years[np.isfinite(years)]
+    low, high = (finite.min(), finite.max()) if len(finite) else (0.0, 1.0)
+    shade = np.rint(np.clip((years - low) / max(high - low, 1e-9), 0, 1) * (SWEEP_SHADES - 1))
+    shade = np.where(np.isnan(years), SWEEP_SHADES, shade).astype(int)
+    styles = pd.DataFrame(palette[shade], index=table.index, columns=table.columns)
+    return table.style.apply(lambda _: styles, axis=None).format('{:.1f}', na_rep='—')
+
+def cached_affordable_result(cache, df, filter_result, terms):
+    """filter_result narrowed to the listings paid off within the years of
+    terms = (down_pct, rate_annual, monthly_budget, years), memoized in cache
+    like a filter result"""
+    key = (filter_result['key'], 'affordable', terms)
+    result = lru_lookup(cache, key)
+    if result is not None:
+        return result
+    positions = filter_result['positions']
+    prices = df['price'].to_numpy()
+    months = mortgage_terms(prices if positions is None else prices[positions], *terms)['months']
+    affordable = np.flatnonzero(months <= terms[3] * 12)
+    positions = affordable if positions is None else positions[affordable]
+    positions.setflags(write=False)
+    result = {
+        'key': key,
+        'digest': listing_set_digest(df['id'].to_numpy()[positions]),
+        'positions': positions,
+        'selectivity': filter_result['selectivity'],
+        'stats': summary_stats(df[['price', 'area']].iloc[positions])
+    }
+    if 'scores' in filter_result:
+        result['scores'] = filter_result['scores'][affordable]
+    return lru_store(cache, key, result, positions.nbytes + result.get('scores', positions[:0]).nbytes)
+
+# Analytics cube: listings pre-aggregated by district x rooms x build-year
+# band x floor type. Every cell keeps its count, price sums and mergeable
+# quantile sketches of price and price per m², so the stats of any union of
+# cells come from adding cells up instead of rescanning the listings.
+CUBE_DIMENSIONS = ['district', 'rooms', 'year', 'floor_type']
+# build-year bands: before 1990, the 1990s, the 2000s, then five-year bands
+CUBE_YEAR_EDGES = [1990, 2000, 2010, 2015, 2020, 2025]
+CUBE_QUANTILES = (0.25, 0.5, 0.75)
+CUBE_CACHE_ENTRIES = 64
+CUBE_CACHE_BYTES = 32 * 1024 * 1024
+# Sketches are log-bucket histograms (the DDSketch layout): bucket edges grow
+# by SKETCH_GAMMA, so every quantile is within SKETCH_ALPHA of the true value
+# (relative), and merging sketches is adding their bucket counts. Values are
+# clamped to [SKETCH_MIN, SKETCH_MAX].
+SKETCH_ALPHA = 0.01
+SKETCH_GAMMA = (1 + SKETCH_ALPHA) / (1 - SKETCH_ALPHA)
+SKETCH_MIN = 1e3
+SKETCH_MAX = 1e13
+SKETCH_BUCKETS = int(math.ceil(math.log(SKETCH_MAX / SKETCH_MIN, SKETCH_GAMMA))) + 1
+
+def sketch_buckets(values):
+    """Sketch bucket of every value (-1 for NaN and values <= 0)"""
+    with np.errstate(divide='ignore', invalid='ignore'):
+        buckets = np.ceil(np.log(np.clip(values, SKETCH_MIN, SKETCH_MAX) / SKETCH_MIN) / math.log(SKETCH_GAMMA))
+    return np.where(values > 0, buckets, -1).astype('int32')
+
+def build_sketches(cell, values, cells):
+    """Sparse sketches of values per cell: (cell, bucket, count) triples"""
+    buckets = sketch_buckets(values)
+    known = buckets >= 0
+    keys, counts = np.unique(cell[known].astype('int64') * SKETCH_BUCKETS + buckets[known], return_counts=True)
+    return {
+        'cell': (keys // SKETCH_BUCKETS).astype('int32'),
+        'bucket': (keys % SKETCH_BUCKETS).astype('int32'),
+        'count': counts
+    }
+
+def merge_sketches(sketches, group, groups):
+    """Bucket counts per group (groups x SKETCH_BUCKETS), adding up the
+    sketches of the cells in each; cells in group -1 are left out"""
+    cell_group = group[sketches['cell']]
+    used = cell_group >= 0
+    merged = np.bincount(
+        cell_group[used] * SKETCH_BUCKETS + sketches['bucket'][used],
+        weights=sketches['count'][used], minlength=groups * SKETCH_BUCKETS
+    )
+    return merged.reshape(groups, SKETCH_BUCKETS)
+
+def sketch_quantiles(counts, quantiles):
+    """Quantiles (columns) of every merged sketch (rows of bucket counts), NaN when empty"""
+    total = counts.sum(axis=1)
+    cumulative = np.cumsum(counts, axis=1)
+    result = np.full((len(counts), len(quantiles)), np.nan)
+    for i, q in enumerate(quantiles):
+        # the first bucket holding the value of rank q * (n - 1)
+        bucket = (cumulative > (q * (total - 1))[:, None]).argmax(axis=1)
+        result[:, i] = SKETCH_MIN * 2 * SKETCH_GAMMA ** bucket / (SKETCH_GAMMA + 1)
+    result[total == 0] = np.nan
+    return result
+
+def _cube_codes(values):
+    """Sorted codes of a dimension, missing values last (labelled '—')"""
+    codes, labels = pd.factorize(values, sort=True)
+    labels = [str(label) for label in labels]
+    return np.where(codes < 0, len(labels), codes), labels + ['—']
+
+def build_price_cube(df):
+    """Count, sums, value ranges and sketches of price and price per m² for
+    every occupied cell of the district x rooms x build-year band x floor
+    type cube"""
+    year = df['year_n'].to_numpy(dtype='float64', na_value=np.nan)
+    band = np.searchsorted(CUBE_YEAR_EDGES, year, side='right')
+    bands = (
+        [f"–{CUBE_YEAR_EDGES[0] - 1}"]
+        + [f"{low}–{high - 1}" for low, high in zip(CUBE_YEAR_EDGES, CUBE_YEAR_EDGES[1:])]
+        + [f"{CUBE_YEAR_EDGES[-1]}–", '—']
+    )
+    codes, labels = {}, {}
+    codes['district'], labels['district'] = _cube_codes(df['district'])
+    codes['rooms'], labels['rooms'] = _cube_codes(df['rooms_n'])
+    codes['year'], labels['year'] = np.where(np.isnan(year), len(bands) - 1, band), bands
+    codes['floor_type'], labels['floor_type'] = _cube_codes(df['floor_type'])
+
+    key = np.zeros(len(df), dtype='int64')
+    for name in CUBE_DIMENSIONS:
+        key = key * len(labels[name]) + codes[name]
+    keys, cell = np.unique(key, return_inverse=True)
+    cell_codes = {}
+    for name in reversed(CUBE_DIMENSIONS):
+        keys, cell_codes[name] = np.divmod(keys, len(labels[name]))
+
+    price = df['price'].to_numpy(dtype='float64')
+    area = df['area'].to_numpy(dtype='float64')
+    with np.errstate(divide='ignore', invalid='ignore'):
+        price_per_m2 = np.where(area > 0, price / area, np.nan)
+    has_m2 = ~np.isnan(price_per_m2)
+    cells = len(cell_codes['district'])
+    # the filtered columns' value range per cell says whether a range filter
+    # keeps a cell whole (see cube_cells)
+    ranges = {}
+    for name, column in [('rooms', 'rooms_n'), ('year', 'year_n')]:
+        span = pd.Series(df[column].to_numpy(dtype='float64', na_value=np.nan)).groupby(cell).agg(['min', 'max'])
+        ranges[name] = (span['min'].to_numpy(), span['max'].to_numpy())
+    return {
+        'size': len(df),
+        'labels': labels,
+        'cells': cell_codes,
+        'ranges': ranges,
+        'count': np.bincount(cell, minlength=cells),
+        'price_sum': np.bincount(cell, weights=price, minlength=cells),
+        'price_sketch': build_sketches(cell, price, cells),
+        'price_m2_sketch': build_sketches(cell[has_m2], price_per_m2[has_m2], cells)
+    }
+
+def cube_cells(cube, filters):
+    """Mask of the cube cells holding exactly the listings that match filters,
+    or None if a filter is not on a cube dimension or splits a cell"""
+    selected = np.ones(len(cube['count']), dtype=bool)
+    for name, value in filters.items():
+        if name in ('district', 'floor_type'):
+            wanted = np.isin(cube['labels'][name], value if name == 'district' else [value])
+            selected &= wanted[cube['cells'][name]]
+        elif name in ('rooms', 'year'):
+            low, high = cube['ranges'][name]
+            inside = (low >= value[0]) & (high <= value[1])
+            outside = (high < value[0]) | (low > value[1])
+            # every cell has either no known year/room count or only known ones;
+            # the year filter keeps listings without a year, the rooms filter drops them
+            unknown = np.isnan(low)
+            if name == 'year':
+                inside |= unknown
+            else:
+                outside |= unknown
+            if not (inside | outside).all():
+                return None
+            selected &= inside
+        else:
+            return None
+    return selected
+
+def cube_breakdown(cube, cells, dimension):
+    """Count, mean price, price quartiles and median price per m² of the
+    selected cells, grouped by one cube dimension (one row per group)"""
+    labels = cube['labels'][dimension]
+    group = np.where(cells, cube['cells'][dimension], -1)
+    used = group >= 0
+    count = np.bincount(group[used], weights=cube['count'][used], minlength=len(labels))
+    price_sum = np.bincount(group[used], weights=cube['price_sum'][used], minlength=len(labels))
+    price = sketch_quantiles(merge_sketches(cube['price_sketch'], group, len(labels)), CUBE_QUANTILES)
+    price_m2 = sketch_quantiles(merge_sketches(cube['price_m2_sketch'], group, len(labels)), [0.5])
+    occupied = count > 0
+    with np.errstate(invalid='ignore'):
+        mean_price = price_sum / count
+    return pd.DataFrame({
+        dimension: np.asarray(labels, dtype=object)[occupied],
+        'count': count[occupied].astype('int64'),
+        'mean_price': mean_price[occupied],
+        'p25_price': price[occupied, 0],
+        'median_price': price[occupied, 1],
+        'p75_price': price[occupied, 2],
+        'median_price_m2': price_m2[occupied, 0]
+    })
+
+def cached_price_cube(cache, df, filter_result):
+    """The cube of just the listings in filter_result, for selections the
+    whole-frame cube cannot answer; memoized in cache by filter key"""
+    cube = lru_lookup(cache, filter_result['key'])
+    if cube is None:
+        positions = filter_result['positions']
+        cube = build_price_cube(df if positions is None else df.iloc[positions])
+        nbytes = sum(part.nbytes for sketch in ('price_sketch', 'price_m2_sketch') for part in cube[sketch].values())
+        cube = lru_store(cache, filter_result['key'], cube, nbytes + 8 * 4 * len(cube['count']))
+    return cube
+
+# Property list: sort orders over the whole frame are computed once; a
+# filter selection keeps its members in that order. Cards are cached HTML.
+LIST_SORTS = {
+    # search score, offered (first) only while a search is active
+    'sort_relevance': (None, True),
+    'sort_default': (None, False),
+    'sort_price_asc': ('price', False),
+    'sort_price_desc': ('price', True),
+    'sort_price_m2_asc': ('price_per_m2', False),
+    'sort_area_desc': ('area', True),
+    'sort_year_desc': ('year', True),
+    'sort_views_desc': ('views', True)
+}
+LIST_PER_PAGE = 20
+CARD_CACHE_ENTRIES = 4096
+CARD_CACHE_BYTES = 32 * 1024 * 1024
+
+def build_sort_index(df):
+    """Ascending permutation of the frame (missing values last) per sort column"""
+    price = df['price'].to_numpy(dtype='float64')
+    area = df['area'].to_numpy(dtype='float64')
+    with np.errstate(divide='ignore', invalid='ignore'):
+        columns = {
+            'price': price,
+            'price_per_m2': np.where(area > 0, price / area, np.nan),
+            'area': area,
+            'year': df['year_n'].to_numpy(dtype='float64', na_value=np.nan),
+            'views': pd.to_numeric(
+                df['views'].astype(str).str.replace(r'\D', '', regex=True), errors='coerce'
+            ).to_numpy(dtype='float64')
+        }
+    return {
+        name: {'order': np.argsort(values, kind='stable'), 'valid': int((~np.isnan(values)).sum())}
+        for name, values in columns.items()
+    }
+
+def sorted_positions(sort_index, positions, size, column, descending=False):
+    """Selected row positions (None: all rows) in the order of a sort column"""
+    if column is None:
+        return np.arange(size) if positions is None else positions
+    entry = sort_index[column]
+    order, valid = entry['order'], entry['valid']
+    if positions is not None:
+        selected = np.zeros(size, dtype=bool)
+        selected[positions] = True
+        keep = selected[order]
+        order, valid = order[keep], int(keep[:valid].sum())
+    if descending:
+        # missing values stay last
+        order = np.concatenate([order[:valid][::-1], order[valid:]])
+    return order
+
+def cached_sorted_positions(cache, sort_index, filter_result, size, sort):
+    key = (filter_result['key'], sort)
+    order = lru_lookup(cache, key)
+    if order is None:
+        column, descending = LIST_SORTS[sort]
+        if sort == 'sort_relevance':
+            # best first; ties keep listing order
+            order = filter_result['positions'][np.argsort(-filter_result['scores'], kind='stable')]
+        else:
+            order = sorted_positions(sort_index, filter_result['positions'], size, column, descending)
+        lru_store(cache, key, order, order.nbytes)
+    return order
+
+def property_card_html(row, image_src=None):
+    """One property list card as a single line of HTML (no blank lines, so
+    markdown passes it through untouched). image_src replaces the CDN photo URL."""
+    def text(value):
+        return html.escape(str(value))
+
+    has_link = row['link'] and row['link'] != 'nan'
+    image_src = image_src or row['image_url']
+    if image_src and image_src != 'nan':
+        image = f"<img src='{text(image_src)}' loading='lazy' alt=''>"
+    else:
+        image = "<div class='property-placeholder'>🏠</div>"
+    if has_link:
+        title = f"<a href='{text(row['link'])}' target='_blank' class='property-title'>{text(row['title'])}</a>"
+    else:
+        title = f"<div class='property-title'>{text(row['title'])}</div>"
+    details = [f"<span>📐 {row['area']:.0f}m²</span>", f"<span>🏢 {text(row['floor'])}/{text(row['building_floor'])}</span>"]
+    if row['year'] and row['year'] != 'nan':
+        details.append(f"<span>📅 {text(row['year'])}</span>")
+    if row['window_count'] and row['window_count'] != 'nan':
+        details.append(f"<span>🪟 {text(row['window_count'])}</span>")
+    features = []
+    if 'balcony_count' in row and row['balcony_count'] not in (None, 'nan'):
+        features.append(f"🌿 {t('balcony_count')}")
+    elif has_feature(row['balcony']):
+        features.append(f"🌿 {t('balcony')}")
+    if row['has_elevator']:
+        features.append(f"⬆️ {t('elevator')}")
+    if row['has_garage']:
+        features.append(f"🚗 {t('garage')}")
+    description = ''
+    if row['description'] and row['description'] != 'nan' and len(row['description']) > 10:
+        description = (
+            f"<details><summary>📝 {t('description')}</summary>"
+            f"{text(row['description']).replace(chr(10), '<br>')}</details>"
+        )
+    if st.session_state.language == 'mn':
+        converted = f"≈ ${row['price'] / 3400:,.0f} USD"
+    else:
+        converted = f"≈ ₮{row['price'] / 1_000_000:.0f}M MNT"
+    side = [
+        f"<div class='property-price'>{format_price(row['price'], st.session_state.language)}</div>",
+        f"<div class='property-caption'>{converted}</div>"
+    ]
+    if row['date'] and row['date'] != 'nan':
+        side.append(f"<div>📅 {text(row['date'])}</div>")
+    if row['views'] and row['views'] != 'nan':
+        side.append(f"<div>👁️ {text(row['views'])} {t('views')}</div>")
+    if has_link:
+        side.append(f"<a class='property-link' href='{text(row['link'])}' target='_blank'>🔗 {t('view_on')}</a>")
+    return (
+        f"<div class='property-card'><div>{image}</div><div>{title}"
+        f"<div class='property-location'>📍 {text(row['location'])} • {text(row['district'])}</div>"
+        f"<div class='property-details'>{''.join(details)}</div>"
+        + ''.join(f"<span class='property-features'>{feature}</span>" for feature in features)
+        + f"{description}{photo_gallery_html(row)}</div><div>{''.join(side)}</div></div>"
+    )
+
+def page_cards_html(cache, thumbnails, df, positions, lang):
+    """Cards for the listings at positions, from the (id, language) card cache.
+
+    Cards whose thumbnail is still being fetched link the CDN photo and are
+    not cached, so a later rerun picks up the local copy.
+    """
+    ids = df['id'].to_numpy()[positions]
+    cards = [lru_lookup(cache, (int(listing_id), lang)) for listing_id in ids]
+    missing = [slot for slot, card in enumerate(cards) if card is None]
+    if not missing:
+        return ''.join(cards)
+    for slot, (_, row) in zip(missing, df.iloc[positions[missing]].iterrows()):
+        image_src, pending = listing_image_src(thumbnails, row)
+        cards[slot] = property_card_html(row, image_src)
+        if not pending:
+            lru_store(cache, (int(ids[slot]), lang), cards[slot], len(cards[slot]))
+    return ''.join(cards)
+
+@st.cache_resource
+def load_listings_index():
+    return build_listings_index(load_unegui_data())
+
+@st.cache_resource
+def load_filter_cache():
+    return new_filter_cache()
+
+@st.cache_resource
+def load_cluster_grid():
+    return build_cluster_grid(load_unegui_data())
+
+@st.cache_resource
+def load_cluster_cache():
+    return new_lru_cache(CLUSTER_CACHE_ENTRIES, CLUSTER_CACHE_BYTES)
+
+@st.cache_resource
+def load_map_tables():
+    return build_map_tables(load_unegui_data(), load_cluster_grid())
+
+@st.cache_resource
+def load_aggregate_cache():
+    return new_lru_cache(CLUSTER_CACHE_ENTRIES, CLUSTER_CACHE_BYTES)
+
+@st.cache_resource
+def load_popup_cache():
+    return new_lru_cache(POPUP_CACHE_ENTRIES, POPUP_CACHE_BYTES)
+
+def load_map_cache():
+    """This session's map cache"""
+    if 'map_cache' not in st.session_state:
+        st.session_state.map_cache = new_lru_cache(MAP_CACHE_ENTRIES, MAP_CACHE_BYTES)
+    return st.session_state.map_cache
+
+@st.cache_resource
+def load_sort_index():
+    return build_sort_index(load_unegui_data())
+
+@st.cache_resource
+def load_card_cache():
+    return new_lru_cache(CARD_CACHE_ENTRIES, CARD_CACHE_BYTES)
+
+@st.cache_resource
+def load_sweep_cache():
+    return new_lru_cache(SWEEP_CACHE_ENTRIES, SWEEP_CACHE_BYTES)
+
+@st.cache_resource
+def load_search_index():
+    """The search index persisted for the loaded listings, built on a miss"""
+    df = load_unegui_data()
+    fingerprint = df.attrs.get('fingerprint')
+    path = _search_index_path(fingerprint) if fingerprint else None
+    index = read_search_index(path) if path else None
+    if index is None or index['n_docs'] != len(df):
+        index = build_search_index(df)
+        if path:
+            write_search_index(path, index)
+    return index
+
+@st.cache_resource
+def load_price_cube():
+    return build_price_cube(load_unegui_data())
+
+@st.cache_resource
+def load_cube_cache():
+    return new_lru_cache(CUBE_CACHE_ENTRIES, CUBE_CACHE_BYTES)
+
+@st.cache_resource
+def load_thumbnail_store():
+    return new_thumbnail_store()
 
 # Load data
 with st.spinner(t('loading')):
     df = load_unegui_data()
+    listings_index = load_listings_index()
+    search_index = load_search_index()
+    price_cube = load_price_cube()
 
 if len(df) == 0:
     st.error("No data available. Please check your data file.")
@@ -434,6 +3106,9 @@ st.info(t('filter_info'))
 # Sidebar filters
 st.sidebar.markdown(f"<div class='filter-section'><h2>{t('filters')}</h2></div>", unsafe_allow_html=True)
 
+# SEARCH
+search_query = st.sidebar.text_input(t('search'), placeholder=t('search_placeholder'))
+
 # BASIC FILTERS
 st.sidebar.markdown(f"### {t('basic_filters')}")
 
@@ -479,11 +3154,10 @@ if max_area > 0:
 else:
     area_range = (0.0, 1000.0)
 
-years = df['year'].unique()
-years_numeric = [int(y) for y in years if y and y != 'nan' and str(y).isdigit()]
-if years_numeric:
-    min_year = min(years_numeric)
-    max_year = max(years_numeric)
+years_numeric = df['year_n'].dropna()
+if not years_numeric.empty:
+    min_year = int(years_numeric.min())
+    max_year = int(years_numeric.max())
     year_range = st.sidebar.slider(
         t('year'),
         min_year,
@@ -510,9 +3184,8 @@ floor_filter = st.sidebar.selectbox(t('floor_type'), floor_options)
 # ROOMS slider
 rooms_range = None
 rooms_has_data = False
-if 'rooms' in df.columns:
-    rooms_extracted = df['rooms'].astype(str).str.extract(r'(\d+)')[0]
-    rooms_numeric = pd.to_numeric(rooms_extracted, errors='coerce')
+if 'rooms_n' in df.columns:
+    rooms_numeric = df['rooms_n']
     if not rooms_numeric.dropna().empty:
         rooms_has_data = True
         min_rooms = int(rooms_numeric.min())
@@ -548,9 +3221,8 @@ if 'balcony_count' in df.columns:
 # WINDOWS slider
 window_range = None
 windows_has_data = False
-if 'window_count' in df.columns:
-    windows_extracted = df['window_count'].astype(str).str.extract(r'(\d+)')[0]
-    windows_numeric = pd.to_numeric(windows_extracted, errors='coerce')
+if 'windows_n' in df.columns:
+    windows_numeric = df['windows_n']
     if not windows_numeric.dropna().empty:
         windows_has_data = True
         min_w = int(windows_numeric.min())
@@ -566,60 +3238,39 @@ if 'window_count' in df.columns:
     )
 
 # APPLY FILTERS
-filtered_df = df.copy()
-
-if selected_districts:
-    filtered_df = filtered_df[filtered_df['district'].isin(selected_districts)]
-
-filtered_df = filtered_df[
-    (filtered_df['price'] >= price_range[0]) &
-    (filtered_df['price'] <= price_range[1]) &
-    (filtered_df['area'] >= area_range[0]) &
-    (filtered_df['area'] <= area_range[1])
-]
-
-if elevator_filter == t('yes'):
-    filtered_df = filtered_df[filtered_df['elevator'].apply(is_elevator_yes)]
-elif elevator_filter == t('no'):
-    filtered_df = filtered_df[filtered_df['elevator'].apply(is_elevator_no)]
-
-if garage_filter == t('yes'):
-    filtered_df = filtered_df[filtered_df['garage'].apply(has_feature)]
-elif garage_filter == t('no'):
-    filtered_df = filtered_df[~filtered_df['garage'].apply(has_feature)]
-
+# only predicates that actually narrow the listings; sliders at full range are skipped
+active_filters = {}
+if set(selected_districts) != set(districts_available):
+    active_filters['district'] = tuple(sorted(selected_districts))
+if price_range_display != (float(min_price_display), float(max_price_display)):
+    active_filters['price'] = price_range
+if max_area > 0 and area_range != (0.0, max_area):
+    active_filters['area'] = area_range
+if elevator_filter != t('any'):
+    active_filters['elevator'] = 'yes' if elevator_filter == t('yes') else 'no'
+if garage_filter != t('any'):
+    active_filters['garage'] = 'yes' if garage_filter == t('yes') else 'no'
 if door_filter != t('any'):
-    filtered_df = filtered_df[filtered_df['door'] == door_filter]
-
+    active_filters['door'] = door_filter
 if floor_filter != t('any'):
-    filtered_df = filtered_df[filtered_df['floor_type'] == floor_filter]
-
-if rooms_range is not None and rooms_has_data:
-    rooms_extracted_f = filtered_df['rooms'].astype(str).str.extract(r'(\d+)')[0]
-    rooms_numeric_f = pd.to_numeric(rooms_extracted_f, errors='coerce')
-    mask_rooms = (rooms_numeric_f >= rooms_range[0]) & (rooms_numeric_f <= rooms_range[1])
-    filtered_df = filtered_df[mask_rooms.fillna(False)]
-
-if balcony_range is not None and 'balcony_count' in filtered_df.columns:
-    balcony_num_f = pd.to_numeric(filtered_df['balcony_count'], errors='coerce')
-    filtered_df = filtered_df[
-        (balcony_num_f >= balcony_range[0]) &
-        (balcony_num_f <= balcony_range[1])
-    ]
-
-if 'year' in filtered_df.columns:
-    filtered_df = filtered_df[
-        filtered_df['year'].apply(
-            lambda y: str(y).isdigit() and year_range[0] <= int(y) <= year_range[1]
-            if y and y != 'nan' else True
-        )
-    ]
-
-if window_range is not None and windows_has_data:
-    windows_extracted_f = filtered_df['window_count'].astype(str).str.extract(r'(\d+)')[0]
-    windows_numeric_f = pd.to_numeric(windows_extracted_f, errors='coerce')
-    mask_windows = (windows_numeric_f >= window_range[0]) & (windows_numeric_f <= window_range[1])
-    filtered_df = filtered_df[mask_windows.fillna(False)]
+    active_filters['floor_type'] = floor_filter
+if rooms_has_data and rooms_range != (min_rooms, max_rooms):
+    active_filters['rooms'] = rooms_range
+if balcony_range is not None and balcony_range != (min_b, max_b):
+    active_filters['balcony'] = balcony_range
+if not years_numeric.empty and year_range != (min_year, max_year):
+    active_filters['year'] = year_range
+if windows_has_data and window_range != (min_w, max_w):
+    active_filters['windows'] = window_range
+
+# language, mortgage and paging changes rerun the script with the same filters
+filter_result = cached_filter_result(load_filter_cache(), df, active_filters, listings_index)
+search_terms = search_words(search_query)
+if search_terms:
+    filter_result = cached_search_result(load_filter_cache(), df, filter_result, search_index, search_terms)
+filter_selectivity = filter_result['selectivity']
+filter_stats = filter_result['stats']
+filtered_df = df if filter_result['positions'] is None else df.iloc[filter_result['positions']]
 
 # Sidebar summary
 st.sidebar.markdown("---")
@@ -628,18 +3279,27 @@ st.sidebar.markdown(
     unsafe_allow_html=True
 )
 
+if filter_selectivity:
+    with st.sidebar.expander(t('filter_debug')):
+        st.dataframe(
+            pd.DataFrame({
+                t('filter_name'): list(filter_selectivity),
+                t('filter_keeps'): [f"{share:.0%}" for share in filter_selectivity.values()]
+            }),
+            hide_index=True
+        )
+
 # TOP STATS
 col1, col2, col3, col4 = st.columns(4)
-if len(filtered_df) > 0:
+if filter_stats['count'] > 0:
     with col1:
-        st.metric(t('avg_price'), format_price(filtered_df['price'].mean(), st.session_state.language))
+        st.metric(t('avg_price'), format_price(filter_stats['mean_price'], st.session_state.language))
     with col2:
-        st.metric(t('median_price'), format_price(filtered_df['price'].median(), st.session_state.language))
+        st.metric(t('median_price'), format_price(filter_stats['median_price'], st.session_state.language))
     with col3:
-        avg_area = filtered_df['area'].mean() if filtered_df['area'].sum() > 0 else 0
-        st.metric(t('avg_area'), f"{avg_area:.0f}m²")
+        st.metric(t('avg_area'), f"{filter_stats['mean_area']:.0f}m²")
     with col4:
-        st.metric(t('total_listings'), len(filtered_df))
+        st.metric(t('total_listings'), filter_stats['count'])
 else:
     with col1:
         st.metric(t('avg_price'), "N/A")
@@ -655,7 +3315,7 @@ st.markdown("<br>", unsafe_allow_html=True)
 # ------------- MORTGAGE CALCULATOR -------------
 st.subheader(t('mortgage_title'))
 
-default_price = int(filtered_df['price'].median()) if len(filtered_df) > 0 else 300_000_000
+default_price = int(filter_stats['median_price']) if filter_stats['count'] > 0 else 300_000_000
 
 calc_c1, calc_c2, calc_c3 = st.columns(3)
 with calc_c1:
@@ -682,12 +3342,16 @@ with calc_c3:
         step=0.1
     )
 
-monthly_budget = st.number_input(
-    t('mortgage_budget'),
-    min_value=0.0,
-    value=2_000_000.0,
-    step=100_000.0
-)
+budget_col, years_col = st.columns(2)
+with budget_col:
+    monthly_budget = st.number_input(
+        t('mortgage_budget'),
+        min_value=0.0,
+        value=2_000_000.0,
+        step=100_000.0
+    )
+with years_col:
+    mortgage_years = st.slider(t('mortgage_years'), min_value=1, max_value=30, value=20)
 
 loan_amount = price_input * (1 - down_pct / 100)
 
@@ -700,30 +3364,85 @@ else:
     elif monthly_budget <= 0:
         st.info(t('mortgage_budget_zero'))
     else:
-        min_payment = loan_amount * r
-        if monthly_budget > min_payment:
+        terms = mortgage_terms([price_input], down_pct, rate_annual, monthly_budget, mortgage_years)
+        n_months = terms['months'][0]
+        if np.isfinite(n_months):
             # normal amortization
-            n_months = -math.log(1 - loan_amount * r / monthly_budget) / math.log(1 + r)
-            years = n_months / 12
-            total_paid = monthly_budget * n_months + price_input * (down_pct / 100)
-            if st.session_state.language == 'mn':
-                duration_text = f"{years:.1f} жил ({n_months:.0f} сар)"
-            else:
-                duration_text = f"{years:.1f} years ({n_months:.0f} months)"
-            st.write(f"{t('mortgage_result_time')}: **{duration_text}**")
-            st.write(f"{t('mortgage_result_total')}: **₮{total_paid:,.0f}**")
+            total_paid = terms['total_paid'][0]
         else:
             # budget too low -> approximate ignoring interest
             st.warning(t('mortgage_budget_low'))
             n_months = loan_amount / monthly_budget
-            years = n_months / 12
             total_paid = monthly_budget * n_months + price_input * (down_pct / 100)
-            if st.session_state.language == 'mn':
-                duration_text = f"{years:.1f} жил ({n_months:.0f} сар)"
-            else:
-                duration_text = f"{years:.1f} years ({n_months:.0f} months)"
-            st.write(f"{t('mortgage_result_time')}: **{duration_text}**")
-            st.write(f"{t('mortgage_result_total')}: **₮{total_paid:,.0f}**")
+        years = n_months / 12
+        if st.session_state.language == 'mn':
+            duration_text = f"{years:.1f} жил ({n_months:.0f} сар)"
+        else:
+            duration_text = f"{years:.1f} years ({n_months:.0f} months)"
+        st.write(f"{t('mortgage_result_time')}: **{duration_text}**")
+        st.write(f"{t('mortgage_result_total')}: **₮{total_paid:,.0f}**")
+        st.write(f"{t('mortgage_result_payment').format(years=mortgage_years)}: **₮{terms['payment'][0]:,.0f}**")
+
+        if np.isfinite(terms['months'][0]):
+            with st.expander(t('mortgage_schedule')):
+                schedule_year = st.number_input(
+                    t('mortgage_schedule_year'),
+                    min_value=1,
+                    max_value=max(1, math.ceil(n_months / 12)),
+                    value=1,
+                    step=1
+                )
+                # only the chosen year's rows are generated
+                year_rows = itertools.islice(
+                    amortization_schedule(loan_amount, rate_annual, monthly_budget),
+                    (schedule_year - 1) * 12, schedule_year * 12
+                )
+                st.dataframe(
+                    pd.DataFrame(year_rows, columns=[
+                        t('mortgage_schedule_month'), t('mortgage_schedule_payment'),
+                        t('mortgage_schedule_interest'), t('mortgage_schedule_principal'),
+                        t('mortgage_schedule_balance')
+                    ]).round(0),
+                    hide_index=True
+                )
+
+# the same inputs the calculator refuses (0% rate, no budget, no loan) hide
+# the affordability filter too
+if filter_stats['count'] > 0 and rate_annual > 0 and monthly_budget > 0 and down_pct < 100:
+    affordable_result = cached_affordable_result(
+        load_filter_cache(), df, filter_result,
+        (down_pct, rate_annual, monthly_budget, mortgage_years)
+    )
+    st.caption(t('mortgage_affordable_count').format(
+        count=affordable_result['stats']['count'], total=filter_stats['count'], years=mortgage_years
+    ))
+    # narrows what the map and the property list below show
+    if st.checkbox(t('mortgage_affordable_only')):
+        filter_result = affordable_result
+        filtered_df = df.iloc[filter_result['positions']]
+
+if st.toggle(t('mortgage_sweep'), help=t('mortgage_sweep_help')):
+    sweep_c1, sweep_c2, sweep_c3 = st.columns(3)
+    with sweep_c1:
+        sweep_rates = st.slider(t('mortgage_rate'), 0.0, 30.0, (4.0, 16.0), step=0.1, key='sweep_rates')
+        rate_steps = st.number_input(t('mortgage_sweep_steps'), 2, SWEEP_MAX_STEPS, 25, key='sweep_rate_steps')
+    with sweep_c2:
+        sweep_downs = st.slider(t('mortgage_down_pct'), 0.0, 100.0, (10.0, 50.0), step=1.0, key='sweep_downs')
+        down_steps = st.number_input(t('mortgage_sweep_steps'), 2, SWEEP_MAX_STEPS, 9, key='sweep_down_steps')
+    with sweep_c3:
+        sweep_budgets = st.slider(
+            t('mortgage_budget'), 0.0, 20_000_000.0, (1_000_000.0, 5_000_000.0),
+            step=100_000.0, key='sweep_budgets'
+        )
+        budget_steps = st.number_input(t('mortgage_sweep_steps'), 1, SWEEP_MAX_BUDGETS, 5, key='sweep_budget_steps')
+    sweep = cached_mortgage_sweep(
+        load_sweep_cache(), price_input,
+        (*sweep_rates, rate_steps), (*sweep_downs, down_steps), (*sweep_budgets, budget_steps)
+    )
+    budget_labels = [f"₮{budget:,.0f}" for budget in sweep['budgets']]
+    budget_label = st.select_slider(t('mortgage_sweep_budget'), options=budget_labels)
+    st.dataframe(sweep_table(sweep, budget_labels.index(budget_label)))
+    st.caption(t('mortgage_sweep_caption'))
 
 st.caption(t('mortgage_hint'))
 
@@ -732,326 +3451,202 @@ st.markdown("<br>", unsafe_allow_html=True)
 # ------------- MAP -------------
 st.subheader(t('map_title'))
 
-if len(filtered_df) > 0:
-    m = folium.Map(
-        location=[47.9184, 106.9177],
-        zoom_start=11,
-        tiles='OpenStreetMap'
-    )
-
-    marker_cluster = plugins.MarkerCluster(
-        name="Properties",
-        overlay=True,
-        control=True
-    ).add_to(m)
-
-    for idx, row in filtered_df.iterrows():
-        # make title clickable if link exists
-        if row['link'] and row['link'] != 'nan':
-            title_html = f"<a href='{row['link']}' target='_blank' style='color:#1e40af;text-decoration:none;'>{row['title']}</a>"
-        else:
-            title_html = row['title']
-
-        popup_html = f"""
-        <div style="width: 350px; font-family: Arial;">
-            <h3 style="margin: 0 0 12px 0; color: #1e40af; font-size: 16px;">{title_html}</h3>
-        """
-        if row['image_url'] and row['image_url'] != 'nan':
-            popup_html += f"""
-            <div style="margin-bottom: 12px;">
-                <img src="{row['image_url']}"
-                     style="width: 100%; height: 200px; object-fit: cover; border-radius: 8px;"
-                     onerror="this.parentElement.style.display='none'">
-            </div>
-            """
-        popup_html += f"""
-            <div style="background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
-                        padding: 12px; border-radius: 8px; margin-bottom: 12px; text-align: center;">
-                <div style="font-size: 28px; font-weight: bold; color: white;">
-                    {format_price(row['price'], st.session_state.language)}
-                </div>
-        """
-        if st.session_state.language == 'mn':
-            usd_price = row['price'] / 3400
-            popup_html += f"""
-                <div style="font-size: 14px; color: rgba(255,255,255,0.9); margin-top: 4px;">
-                    ≈ ${usd_price:,.0f} USD
-                </div>
-            """
-        else:
-            mnt_millions = row['price'] / 1_000_000
-            popup_html += f"""
-                <div style="font-size: 14px; color: rgba(255,255,255,0.9); margin-top: 4px;">
-                    ≈ ₮{mnt_millions:.0f}M MNT
-                </div>
-            """
-        popup_html += "</div>"
-
-        popup_html += f"""
-            <div style="display: grid; grid-template-columns: 1fr 1fr; gap: 8px; margin-bottom: 12px;">
-                <div style="background: #f3f4f6; padding: 8px; border-radius: 6px; text-align: center;">
-                    <div style="font-size: 11px; color: #6b7280;">📐 {t('area')}</div>
-                    <div style="font-size: 18px; font-weight: bold; color: #1f2937;">{row['area']:.0f}m²</div>
-                </div>
-                <div style="background: #f3f4f6; padding: 8px; border-radius: 6px; text-align: center;">
-                    <div style="font-size: 11px; color: #6b7280;">🏢 {t('floor')}</div>
-                    <div style="font-size: 18px; font-weight: bold; color: #1f2937;">{row['floor']}/{row['building_floor']}</div>
-                </div>
-            </div>
-        """
-
-        popup_html += f"""
-            <div style="font-size: 13px; margin-bottom: 10px; padding: 10px; background: #fef3c7; border-radius: 6px;">
-                <strong>📍 {t('location')}:</strong><br>
-                {row['location']}<br>
-                <span style="color: #92400e; font-weight: 600;">{row['district']} {t('district')}</span>
-            </div>
-        """
-
-        features = []
-        if 'balcony_count' in row and row['balcony_count'] not in (None, 'nan'):
-            try:
-                bc = int(float(row['balcony_count']))
-                features.append(f"🌿 {t('balcony_count')}: {bc}")
-            except Exception:
-                pass
-        elif has_feature(row['balcony']):
-            features.append(f"🌿 {t('balcony')}: {row['balcony']}")
-        if is_elevator_yes(row['elevator']):
-            features.append(f"⬆️ {t('elevator')}: {row['elevator']}")
-        if has_feature(row['garage']):
-            features.append(f"🚗 {t('garage')}: {row['garage']}")
-        if row['year'] and row['year'] != 'nan':
-            features.append(f"📅 {t('year')}: {row['year']}")
-        if row['window_count'] and row['window_count'] != 'nan':
-            features.append(f"🪟 {t('window_count')}: {row['window_count']}")
-
-        if features:
-            popup_html += f"""
-            <div style="font-size: 12px; margin-bottom: 10px; padding: 10px; background: #dbeafe; border-radius: 6px;">
-                <strong>{t('features')}:</strong><br>
-                {' • '.join(features)}
-            </div>
-            """
+map_layer = st.radio(
+    t('map_layer'),
+    [t('map_layer_markers'), t('map_layer_heatmap'), t('map_layer_districts')],
+    horizontal=True
+)
+show_markers = map_layer == t('map_layer_markers')
+viewport_mode = show_markers and st.toggle(t('map_viewport'), value=True, help=t('map_viewport_help'))
 
-        if row['description'] and row['description'] != 'nan' and len(row['description']) > 10:
-            popup_html += f"""
-            <div style="font-size: 12px; margin-bottom: 10px; padding: 8px; background: #f9fafb;
-                        border-left: 3px solid #3b82f6; max-height: 80px; overflow-y: auto;">
-                {row['description']}
-            </div>
-            """
-
-        meta_items = []
-        if row['date'] and row['date'] != 'nan':
-            meta_items.append(f"📅 {row['date']}")
-        if row['views'] and row['views'] != 'nan':
-            meta_items.append(f"👁️ {row['views']} {t('views')}")
-
-        if meta_items:
-            popup_html += f"""
-            <div style="font-size: 11px; color: #6b7280; margin-bottom: 10px; padding: 8px; background: #f3f4f6; border-radius: 6px;">
-                {' • '.join(meta_items)}
-            </div>
-            """
-
-        if row['link'] and row['link'] != 'nan':
-            popup_html += f"""
-            <a href="{row['link']}" target="_blank"
-               style="display: block; background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
-                      color: white; padding: 12px; border-radius: 8px; text-decoration: none;
-                      font-size: 14px; text-align: center; font-weight: bold; box-shadow: 0 4px 6px rgba(0,0,0,0.1);">
-                {t('view_on')} →
-            </a>
-            """
-
-        popup_html += "</div>"
-
-        folium.Marker(
-            location=[row['lat'], row['lng']],
-            popup=folium.Popup(popup_html, max_width=350),
-            tooltip=f"{row['title']} - {format_price(row['price'], st.session_state.language)}",
-            icon=folium.Icon(
-                color=get_marker_color(row['price']),
-                icon='home',
-                prefix='fa'
+if len(filtered_df) > 0:
+    map_cache = load_map_cache()
+    if viewport_mode:
+        # the base map stays mounted; only the viewport's layer is re-sent
+        # when the user pans or zooms
+        m = listings_base_map()
+        last_view = st.session_state.get('listings_map') or {}
+        zoom = last_view.get('zoom') or m.options['zoom']
+        bounds = last_view.get('bounds')
+        layer_key = ('viewport', filter_result['digest'], st.session_state.language, repr(bounds), int(zoom))
+        cached_layer = lru_lookup(map_cache, layer_key)
+        if cached_layer is None:
+            clusters = None
+            if zoom < CLUSTER_MAX_ZOOM:
+                clusters = cached_cluster_level(
+                    load_cluster_cache(), load_cluster_grid(),
+                    filter_result['key'], filter_result['positions'], zoom
+                )
+            layer, in_view = viewport_layer(filtered_df, bounds, clusters)
+            cached_layer = lru_store(
+                map_cache, layer_key, (layer, in_view, clusters is None),
+                MAP_BYTES_PER_MARKER * min(len(filtered_df), MAP_MARKER_LIMIT)
             )
-        ).add_to(marker_cluster)
-
-    legend_html = f"""
-    <div style="position: fixed;
-                bottom: 50px; right: 50px;
-                background: white;
-                padding: 15px;
-                border-radius: 10px;
-                box-shadow: 0 4px 6px rgba(0,0,0,0.1);
-                z-index: 1000;
-                font-family: Arial;">
-        <h4 style="margin: 0 0 10px 0; font-size: 14px;">{t('price_legend')}</h4>
-        <div style="font-size: 12px;">
-            <div style="margin: 5px 0;">
-                <span style="color: green; font-size: 16px;">●</span> < ₮200 {t('million')}
-            </div>
-            <div style="margin: 5px 0;">
-                <span style="color: blue; font-size: 16px;">●</span> ₮200-400 {t('million')}
-            </div>
-            <div style="margin: 5px 0;">
-                <span style="color: orange; font-size: 16px;">●</span> ₮400-600 {t('million')}
-            </div>
-            <div style="margin: 5px 0%;">
-                <span style="color: red; font-size: 16px;">●</span> > ₮600 {t('million')}
-            </div>
-        </div>
-    </div>
-    """
-    m.get_root().html.add_child(folium.Element(legend_html))
+        layer, in_view, unclustered = cached_layer
+        if unclustered and in_view > MAP_MARKER_LIMIT:
+            st.caption(t('map_zoom_in').format(count=in_view))
+        map_state = st_folium(
+            m,
+            key='listings_map',
+            width=None,
+            height=600,
+            feature_group_to_add=layer,
+            returned_objects=['bounds', 'zoom', 'last_object_clicked_popup']
+        )
+    else:
+        map_key = ('map', filter_result['digest'], st.session_state.language, map_layer)
+        m = lru_lookup(map_cache, map_key)
+        # a cached map was rendered when it was first shown
+        rendered = m is not None
+        if m is None:
+            m = listings_base_map(show_legend=show_markers)
+            if not show_markers:
+                aggregates = cached_map_aggregates(
+                    load_aggregate_cache(), load_map_tables(), filter_result['key'], filter_result['positions']
+                )
+                if map_layer == t('map_layer_heatmap'):
+                    add_price_heatmap(m, aggregates['heat'])
+                else:
+                    add_district_layer(m, aggregates['districts'])
+            elif len(filtered_df) > MAP_BULK_THRESHOLD:
+                bulk_marker_layer(filtered_df).add_to(m)
+            else:
+                marker_cluster = plugins.MarkerCluster(
+                    name="Properties",
+                    overlay=True,
+                    control=True
+                ).add_to(m)
+
+                for _, row in filtered_df.iterrows():
+                    add_listing_marker(marker_cluster, row, listing_popup_html(row))
+            lru_store(map_cache, map_key, m, MAP_BYTES_PER_MARKER * (len(filtered_df) if show_markers else 16))
+        map_state = st_folium(
+            m,
+            width=None,
+            height=600,
+            returned_objects=['last_object_clicked_popup'],
+            render=not rendered
+        )
 
-    st_folium(m, width=None, height=600)
+    # stub popups (viewport and bulk modes) name the listing; show its card
+    clicked_id = clicked_listing_id((map_state or {}).get('last_object_clicked_popup'))
+    if clicked_id is not None:
+        clicked = np.flatnonzero(filtered_df['id'].to_numpy() == clicked_id)
+        if len(clicked):
+            st.markdown(
+                cached_popup_html(
+                    load_popup_cache(), load_thumbnail_store(),
+                    filtered_df.iloc[clicked[0]], st.session_state.language
+                ),
+                unsafe_allow_html=True
+            )
 
 else:
     st.warning(t('no_results'))
 
+with st.sidebar.expander(t('cache_debug')):
+    caches = {
+        'map': load_map_cache(),
+        'filter': load_filter_cache(),
+        'cluster': load_cluster_cache(),
+        'aggregate': load_aggregate_cache(),
+        'popup': load_popup_cache(),
+        'card': load_card_cache(),
+        'sweep': load_sweep_cache(),
+        'cube': load_cube_cache(),
+        'thumbnail': load_thumbnail_store()['index']
+    }
+    st.dataframe(
+        pd.DataFrame({
+            t('cache_name'): list(caches),
+            t('cache_entries'): [len(cache['entries']) for cache in caches.values()],
+            t('cache_hits'): [cache['hits'] for cache in caches.values()],
+            t('cache_misses'): [cache['misses'] for cache in caches.values()],
+            'MB': [round(cache['bytes'] / 1024 / 1024, 1) for cache in caches.values()]
+        }),
+        hide_index=True
+    )
+    st.caption(f"{t('memory_per_listing')}: {memory_report(df).loc['total', 'bytes_per_listing']:.0f} B")
+    extraction = df.attrs.get('extraction')
+    if extraction:
+        rate = extraction['parsed'] / max(extraction['seconds'], 1e-9)
+        st.caption(t('extract_rate').format(rate=rate, **extraction))
+
+# ------------- ANALYTICS -------------
+st.markdown("<br><br>", unsafe_allow_html=True)
+st.subheader(t('analytics_title'))
+
+# filters on the cube's dimensions are answered by adding up its cells; any
+# other narrowing (price, features, search, affordability) aggregates the
+# selected listings once per filter state
+cube_selection = None
+if filter_result['key'] == filter_cache_key(active_filters):
+    cube_selection = cube_cells(price_cube, active_filters)
+if cube_selection is None:
+    analytics_cube = cached_price_cube(load_cube_cache(), df, filter_result)
+    cube_selection = np.ones(len(analytics_cube['count']), dtype=bool)
+    analytics_source = t('analytics_from_rows')
+else:
+    analytics_cube = price_cube
+    analytics_source = t('analytics_from_cube').format(count=int(cube_selection.sum()))
+
+group_labels = [t(dimension) for dimension in CUBE_DIMENSIONS]
+group_label = st.selectbox(t('analytics_group_by'), group_labels)
+dimension = CUBE_DIMENSIONS[group_labels.index(group_label)]
+breakdown = cube_breakdown(analytics_cube, cube_selection, dimension)
+if len(breakdown):
+    lang = st.session_state.language
+    st.dataframe(
+        pd.DataFrame({
+            t(dimension): breakdown[dimension],
+            t('total_listings'): breakdown['count'],
+            t('avg_price'): format_price_series(breakdown['mean_price'], lang),
+            t('analytics_p25'): format_price_series(breakdown['p25_price'], lang),
+            t('median_price'): format_price_series(breakdown['median_price'], lang),
+            t('analytics_p75'): format_price_series(breakdown['p75_price'], lang),
+            t('analytics_median_m2'): format_price_m2_series(breakdown['median_price_m2'], lang)
+        }),
+        hide_index=True
+    )
+st.caption(analytics_source)
+
 # ------------- PROPERTY LIST WITH PAGINATION -------------
 st.markdown("<br><br>", unsafe_allow_html=True)
 st.subheader(t('property_list'))
 
 if len(filtered_df) > 0:
-    PER_PAGE = 20
     total = len(filtered_df)
-    total_pages = (total - 1) // PER_PAGE + 1
-
-    page = st.number_input(
-        "Page",
-        min_value=1,
-        max_value=total_pages,
-        value=1,
-        step=1
-    )
+    total_pages = (total - 1) // LIST_PER_PAGE + 1
+
+    sort_col, page_col = st.columns([3, 1])
+    with sort_col:
+        sorts = [sort for sort in LIST_SORTS if sort != 'sort_relevance' or 'scores' in filter_result]
+        sort_label = st.selectbox(t('sort_by'), [t(sort) for sort in sorts])
+    with page_col:
+        page = st.number_input(
+            "Page",
+            min_value=1,
+            max_value=total_pages,
+            value=1,
+            step=1
+        )
+    sort = next(sort for sort in sorts if t(sort) == sort_label)
 
-    start = (page - 1) * PER_PAGE
-    end = start + PER_PAGE
-    page_df = filtered_df.iloc[start:end]
+    start = (page - 1) * LIST_PER_PAGE
+    end = start + LIST_PER_PAGE
+    ordered = cached_sorted_positions(load_filter_cache(), load_sort_index(), filter_result, len(df), sort)
 
     st.caption(f"Showing {start+1}-{min(end, total)} of {total} listings")
 
-    for idx, row in page_df.iterrows():
-        with st.container():
-            st.markdown("""
-            <style>
-                .property-card {
-                    background: white;
-                    border-radius: 12px;
-                    padding: 20px;
-                    margin-bottom: 20px;
-                    box-shadow: 0 4px 12px rgba(0,0,0,0.08);
-                    transition: transform 0.2s, box-shadow 0.2s;
-                }
-                .property-card:hover {
-                    transform: translateY(-4px);
-                    box-shadow: 0 8px 24px rgba(0,0,0,0.12);
-                }
-                .property-title {
-                    color: #1e40af;
-                    font-size: 20px;
-                    font-weight: 600;
-                    margin-bottom: 8px;
-                }
-                .property-location {
-                    color: #6b7280;
-                    font-size: 14px;
-                    margin-bottom: 12px;
-                }
-                .property-price {
-                    color: #7c3aed;
-                    font-size: 32px;
-                    font-weight: 700;
-                }
-                .property-features {
-                    display: inline-block;
-                    background: #dbeafe;
-                    color: #1e40af;
-                    padding: 4px 12px;
-                    border-radius: 16px;
-                    font-size: 12px;
-                    margin: 4px 4px 4px 0;
-                }
-            </style>
-            """, unsafe_allow_html=True)
-
-            col1, col2, col3 = st.columns([1, 2, 1])
-
-            with col1:
-                if row['image_url'] and row['image_url'] != 'nan':
-                    st.image(row['image_url'], use_container_width=True)
-                else:
-                    st.markdown("""
-                    <div style="background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
-                                height: 200px; border-radius: 12px; display: flex;
-                                align-items: center; justify-content: center; color: white; font-size: 48px;">
-                        🏠
-                    </div>
-                    """, unsafe_allow_html=True)
-
-            with col2:
-                if row['link'] and row['link'] != 'nan':
-                    title_html = f"<a href='{row['link']}' target='_blank' class='property-title' style='text-decoration:none;'>{row['title']}</a>"
-                else:
-                    title_html = f"<div class='property-title'>{row['title']}</div>"
-                st.markdown(title_html, unsafe_allow_html=True)
-
-                st.markdown(
-                    f"<div class='property-location'>📍 {row['location']} • {row['district']}</div>",
-                    unsafe_allow_html=True
-                )
+    # fetch this page's photos and the next page's in the background
+    thumbnails = load_thumbnail_store()
+    request_thumbnails(thumbnails, df['image_url'].iloc[ordered[start:end + LIST_PER_PAGE]])
 
-                detail_cols = st.columns(4)
-                with detail_cols[0]:
-                    st.markdown(f"**📐 {row['area']:.0f}m²**")
-                with detail_cols[1]:
-                    st.markdown(f"**🏢 {row['floor']}/{row['building_floor']}**")
-                with detail_cols[2]:
-                    if row['year'] and row['year'] != 'nan':
-                        st.markdown(f"**📅 {row['year']}**")
-                with detail_cols[3]:
-                    if row['window_count'] and row['window_count'] != 'nan':
-                        st.markdown(f"**🪟 {row['window_count']}**")
-
-                features_html = ""
-                if 'balcony_count' in row and row['balcony_count'] not in (None, 'nan'):
-                    features_html += f"<span class='property-features'>🌿 {t('balcony_count')}</span>"
-                elif has_feature(row['balcony']):
-                    features_html += f"<span class='property-features'>🌿 {t('balcony')}</span>"
-                if is_elevator_yes(row['elevator']):
-                    features_html += f"<span class='property-features'>⬆️ {t('elevator')}</span>"
-                if has_feature(row['garage']):
-                    features_html += f"<span class='property-features'>🚗 {t('garage')}</span>"
-
-                if features_html:
-                    st.markdown(features_html, unsafe_allow_html=True)
-
-                if row['description'] and row['description'] != 'nan' and len(row['description']) > 10:
-                    with st.expander("📝 " + t('description')):
-                        st.write(row['description'])
-
-            with col3:
-                st.markdown(
-                    f"<div class='property-price'>{format_price(row['price'], st.session_state.language)}</div>",
-                    unsafe_allow_html=True
-                )
-                if st.session_state.language == 'mn':
-                    usd = row['price'] / 3400
-                    st.caption(f"≈ ${usd:,.0f} USD")
-                else:
-                    mnt_millions = row['price'] / 1_000_000
-                    st.caption(f"≈ ₮{mnt_millions:.0f}M MNT")
-                if row['date'] and row['date'] != 'nan':
-                    st.markdown(f"📅 {row['date']}")
-                if row['views'] and row['views'] != 'nan':
-                    st.markdown(f"👁️ {row['views']} {t('views')}")
-                if row['link'] and row['link'] != 'nan':
-                    st.link_button("🔗 " + t('view_on'), row['link'], use_container_width=True)
-
-            st.divider()
+    # the whole page is one markdown element; cards come from the card cache
+    st.markdown(
+        page_cards_html(load_card_cache(), thumbnails, df, ordered[start:end], st.session_state.language),
+        unsafe_allow_html=True
+    )
 
     st.caption(f"Page {page} of {total_pages}")
 
@@ -0,0 +1,76 @@
+"""Server-side clustering: cluster grid build and per-zoom cluster queries.
+
+    python bench/clusters.py [SIZES...]
+
+Points are spread uniformly over Ulaanbaatar with prices drawn from the
+shipped listings. Each query is checked against a pandas groupby on the
+points' tile cells; times are the best of five runs.
+"""
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from common import best_of, load_app, shipped_listings, size_arg
+
+# Ulaanbaatar, roughly the area the district centres and jitter cover
+LAT_RANGE = (47.84, 47.98)
+LNG_RANGE = (106.75, 107.06)
+ZOOMS = (10, 15)
+SELECTIONS = {'all rows': None, '30% selected': 0.3, '3% selected': 0.03}
+
+
+def spread_points(prices, size, rng):
+    return pd.DataFrame({
+        'lat': rng.uniform(*LAT_RANGE, size),
+        'lng': rng.uniform(*LNG_RANGE, size),
+        'price': rng.choice(prices, size),
+    })
+
+
+def groupby_clusters(app, points, positions, zoom):
+    """Counts and median prices per tile cell, straight from the coordinates"""
+    selected = points if positions is None else points.iloc[positions]
+    cells = 2 ** zoom * 256 / app.CLUSTER_CELL_PX
+    x = ((selected['lng'] + 180.0) / 360.0 * cells).astype('int64')
+    y = ((1.0 - np.arcsinh(np.tan(np.radians(selected['lat']))) / np.pi) / 2.0 * cells).astype('int64')
+    return selected['price'].groupby([x, y]).agg(['size', 'median'])
+
+
+def check(app, grid, points, positions, zoom):
+    clusters = app.cluster_level(grid, positions, zoom)
+    expected = groupby_clusters(app, points, positions, zoom)
+    assert len(clusters['counts']) == len(expected)
+    found = pd.DataFrame({'size': clusters['counts'], 'median': clusters['median_price']})
+    expected = expected.sort_values(['size', 'median']).reset_index(drop=True)
+    found = found.sort_values(['size', 'median']).reset_index(drop=True)
+    pd.testing.assert_frame_equal(found, expected, check_dtype=False)
+    return len(expected)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('sizes', nargs='*', type=size_arg, default=[100_000, 1_000_000])
+    args = parser.parse_args()
+
+    app = load_app()
+    prices = shipped_listings(app)['price'].to_numpy(dtype='float64')
+    rng = np.random.default_rng(0)
+    for size in args.sizes:
+        points = spread_points(prices, size, rng)
+        start = time.perf_counter()
+        grid = app.build_cluster_grid(points)
+        print(f'{size:,} points: grid built in {(time.perf_counter() - start) * 1e3:.0f} ms')
+        for label, share in SELECTIONS.items():
+            positions = None if share is None else np.sort(rng.choice(size, int(size * share), replace=False))
+            timings = []
+            for zoom in ZOOMS:
+                count = check(app, grid, points, positions, zoom)
+                elapsed = best_of(lambda: app.cluster_level(grid, positions, zoom))
+                timings.append(f'zoom {zoom}: {elapsed * 1e3:6.1f} ms, {count:>6,} clusters')
+            print(f'  {label:<13} ' + '   '.join(timings))
+
+
+if __name__ == '__main__':
+    main()
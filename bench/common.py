@@ -0,0 +1,65 @@
+"""Shared setup for the benchmark scripts in this directory.
+
+Run them from the repository root, e.g. ``python bench/jitter.py``. They load
+App.py's definitions without running the page (as the tests do) and work on
+the shipped data file, tiled up to the sizes being measured.
+"""
+import logging
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DATA_FILE = os.path.join(ROOT, 'unegui_data.csv')
+
+sys.path.insert(0, os.path.join(ROOT, 'tests'))
+from conftest import load_app_definitions  # noqa: E402
+
+
+def load_app():
+    app = load_app_definitions()
+    # streamlit warns about running without `streamlit run` on every cached
+    # call and session state access
+    for name in list(logging.root.manager.loggerDict):
+        if name.startswith('streamlit'):
+            logging.getLogger(name).setLevel(logging.ERROR)
+    app.st.session_state.language = 'mn'
+    return app
+
+
+def shipped_listings(app):
+    """The listings frame of the shipped data file, built without the disk caches"""
+    raw = app.read_scrape_csv(DATA_FILE)
+    return app.finalize_listings(app.process_listings(raw, extractions=app.new_extraction_cache()))
+
+
+def tiled_listings(app, listings, size):
+    """size listings made by repeating the shipped ones, each copy with its own
+    ids and therefore its own jittered coordinates"""
+    copies = -(-size // len(listings))
+    tiled = pd.concat([listings] * copies, ignore_index=True).iloc[:size].copy()
+    copy_number = np.arange(len(tiled)) // len(listings)
+    tiled['id'] = tiled['id'].to_numpy(dtype='int64') ^ (copy_number.astype('int64') << 40)
+    lat, lng = app.district_coordinates(tiled['district'].astype(object), tiled['id'])
+    tiled['lat'], tiled['lng'] = lat.astype('float32'), lng.astype('float32')
+    return tiled
+
+
+def best_of(function, repeat=5):
+    """Fastest of repeat calls to function, in seconds"""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def size_arg(text):
+    """Sizes like 100k or 1M"""
+    text = text.lower()
+    scale = {'k': 1_000, 'm': 1_000_000}.get(text[-1], 1)
+    return int(float(text.rstrip('km')) * scale)
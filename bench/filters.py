@@ -0,0 +1,79 @@
+"""Filters: the bitmap listings index against the per-filter masks.
+
+    python bench/filters.py [SIZES...]
+
+For each filter state, both paths must return the same rows and
+selectivities; the table shows the best of ten runs of each.
+"""
+import argparse
+import time
+
+import numpy as np
+
+from common import best_of, load_app, shipped_listings, size_arg, tiled_listings
+
+
+def array_bytes(value):
+    """Bytes held by the NumPy arrays in a nest of dicts and lists"""
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    if isinstance(value, dict):
+        value = list(value.values())
+    if isinstance(value, list):
+        return sum(array_bytes(item) for item in value)
+    return 0
+
+
+def filter_states(listings):
+    price = listings['price'].to_numpy(dtype='float64')
+    area = listings['area'].to_numpy(dtype='float64')
+    top_district = listings['district'].value_counts().index[0]
+    top_door = listings['door'].value_counts().index[0]
+    return {
+        'narrow (district+price+rooms+door)': {
+            'district': (top_district,),
+            'price': tuple(np.quantile(price, [0.2, 0.6])),
+            'rooms': (2, 3),
+            'door': top_door,
+        },
+        'broad (7 predicates)': {
+            'price': tuple(np.quantile(price, [0.1, 0.9])),
+            'area': tuple(np.quantile(area, [0.05, 0.95])),
+            'rooms': (1, 4),
+            'balcony': (0, 3),
+            'year': (2000, 2025),
+            'windows': (1, 10),
+            'elevator': 'yes',
+        },
+        'single price range': {
+            'price': tuple(np.quantile(price, [0.2, 0.8])),
+        },
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('sizes', nargs='*', type=size_arg, default=[100_000, 1_000_000])
+    args = parser.parse_args()
+
+    app = load_app()
+    listings = shipped_listings(app)
+    for size in args.sizes:
+        tiled = tiled_listings(app, listings, size)
+        start = time.perf_counter()
+        index = app.build_listings_index(tiled)
+        build = time.perf_counter() - start
+        print(f'{size:,} rows: index built in {build:.2f} s, {array_bytes(index) / 2**20:.0f} MB')
+        for label, filters in filter_states(tiled).items():
+            by_index = app.filter_positions(tiled, filters, index)
+            by_masks = app.filter_positions(tiled, filters)
+            assert np.array_equal(by_index[0], by_masks[0]), label
+            assert by_index[1] == by_masks[1], label
+            indexed = best_of(lambda: app.filter_positions(tiled, filters, index), repeat=10)
+            masked = best_of(lambda: app.filter_positions(tiled, filters), repeat=10)
+            print(f'  {label:<36} {len(by_index[0]):>9,} matches  '
+                  f'{indexed * 1e3:6.2f} ms index  {masked * 1e3:6.2f} ms masks')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,88 @@
+"""Ingest: the whole-file read against streaming, in wall time and peak RSS.
+
+    python bench/ingest.py [--copies N] [--chunk-rows N ...]
+
+Writes the shipped data file repeated --copies times to a temporary file and
+builds the listings store from scratch once per mode, each in a fresh
+process so peak RSS is its own. Also reports what the raw frame takes in
+memory with every column against only SOURCE_COLUMNS, the columns the
+stream reads.
+"""
+import argparse
+import os
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+import pandas as pd
+
+from common import DATA_FILE, load_app
+
+
+def write_tiled_csv(path, copies):
+    with open(DATA_FILE, 'rb') as f:
+        header = f.readline()
+        body = f.read()
+    with open(path, 'wb') as f:
+        f.write(header)
+        for _ in range(copies):
+            f.write(body)
+
+
+def run(path, chunk_rows):
+    """Build the store in this process and print wall time and peak RSS"""
+    app = load_app()
+    imported = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    start = time.perf_counter()
+    store = app.update_listings_store(
+        path, app.source_signature(path), chunk_rows=chunk_rows, extractions=app.new_extraction_cache()
+    )
+    elapsed = time.perf_counter() - start
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    print(f'{elapsed:.1f} s, peak RSS {peak / 1024:.0f} MB (after imports {imported / 1024:.0f} MB), '
+          f'{len(store["listings"]):,} listings')
+
+
+def column_report(app, path, rows):
+    every = pd.read_csv(path, dtype=str, nrows=rows)
+    read = every[[name for name in every.columns if name in app.SOURCE_COLUMNS]]
+    skipped = [name for name in every.columns if name not in app.SOURCE_COLUMNS]
+    for label, frame in (('every column', every), ('SOURCE_COLUMNS', read)):
+        nbytes = frame.memory_usage(deep=True, index=False).sum()
+        print(f'  {label:<15} {len(frame.columns):>2} columns, {nbytes / len(frame):6.0f} bytes per raw row')
+    print(f'  not read: {", ".join(skipped)}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--copies', type=int, default=400)
+    parser.add_argument('--chunk-rows', type=int, nargs='*', default=[50_000, 20_000, 5_000])
+    parser.add_argument('--run', nargs=2, metavar=('PATH', 'CHUNK_ROWS'), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.run:
+        path, chunk_rows = args.run
+        run(path, int(chunk_rows) or None)
+        return
+
+    directory = tempfile.mkdtemp()
+    try:
+        path = os.path.join(directory, 'unegui_data.csv')
+        write_tiled_csv(path, args.copies)
+        print(f'{args.copies} copies of the data file: {os.path.getsize(path) / 2**20:.0f} MB')
+        column_report(load_app(), path, rows=50_000)
+        for chunk_rows in [0, *args.chunk_rows]:
+            label = 'full read' if not chunk_rows else f'stream, {chunk_rows:,} rows'
+            result = subprocess.run(
+                [sys.executable, __file__, '--run', path, str(chunk_rows)],
+                capture_output=True, text=True, check=True
+            )
+            print(f'  {label:<22} {result.stdout.strip()}')
+    finally:
+        shutil.rmtree(directory)
+
+
+if __name__ == '__main__':
+    main()
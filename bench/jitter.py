@@ -0,0 +1,56 @@
+"""Marker jitter: district_coordinates against the per-row random.seed version.
+
+    python bench/jitter.py [SIZES...] [--per-row-max N]
+
+The per-row version is timed on at most --per-row-max rows and scaled up
+linearly beyond that.
+"""
+import argparse
+import random
+import time
+
+import numpy as np
+
+from common import best_of, load_app, shipped_listings, size_arg, tiled_listings
+
+
+def per_row_coordinates(app, districts, ids):
+    """The loader's old jitter: reseed the global RNG and draw two uniforms per row"""
+    lat, lng = [], []
+    for district, seed in zip(districts, ids.tolist()):
+        random.seed(seed)
+        center = app.DISTRICT_CENTERS.get(district, app.DISTRICT_CENTERS['Unknown'])
+        lat.append(center[0] + random.uniform(-0.025, 0.025))
+        lng.append(center[1] + random.uniform(-0.025, 0.025))
+    return np.array(lat), np.array(lng)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('sizes', nargs='*', type=size_arg, default=[10_000, 100_000, 1_000_000])
+    parser.add_argument('--per-row-max', type=size_arg, default=100_000)
+    args = parser.parse_args()
+
+    app = load_app()
+    listings = shipped_listings(app)
+    print(f"{'rows':>10}  {'vectorized':>11}  {'per-row':>10}  speedup")
+    for size in args.sizes:
+        tiled = tiled_listings(app, listings, size)
+        districts = tiled['district'].astype(object).to_numpy()
+        ids = tiled['id'].to_numpy()
+
+        first = app.district_coordinates(districts, ids)
+        again = app.district_coordinates(districts, ids)
+        assert all(np.array_equal(a, b) for a, b in zip(first, again)), 'jitter is not deterministic'
+
+        vectorized = best_of(lambda: app.district_coordinates(districts, ids), repeat=3)
+        rows = min(size, args.per_row_max)
+        start = time.perf_counter()
+        per_row_coordinates(app, districts[:rows], ids[:rows])
+        per_row = (time.perf_counter() - start) * size / rows
+        note = '' if rows == size else f'  (per-row scaled from {rows:,})'
+        print(f'{size:>10,}  {vectorized:>10.3f}s  {per_row:>9.2f}s  {per_row / vectorized:>6.0f}x{note}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,59 @@
+"""Full-map construction: a folium.Marker per listing against the bulk layer.
+
+    python bench/map_layers.py [SIZES...] [--per-marker-max N]
+
+Times the Python side only: building the folium map, then rendering it to
+the HTML st_folium sends. The per-marker layer is skipped above
+--per-marker-max rows.
+"""
+import argparse
+import time
+
+from folium import plugins
+
+from common import load_app, shipped_listings, size_arg, tiled_listings
+
+
+def per_marker_map(app, listings):
+    """The map as built below MAP_BULK_THRESHOLD"""
+    m = app.listings_base_map()
+    marker_cluster = plugins.MarkerCluster(name="Properties", overlay=True, control=True).add_to(m)
+    for _, row in listings.iterrows():
+        app.add_listing_marker(marker_cluster, row, app.listing_popup_html(row))
+    return m
+
+
+def bulk_map(app, listings):
+    """The map as built above MAP_BULK_THRESHOLD"""
+    m = app.listings_base_map()
+    app.bulk_marker_layer(listings).add_to(m)
+    return m
+
+
+def measure(build, app, listings):
+    start = time.perf_counter()
+    m = build(app, listings)
+    built = time.perf_counter() - start
+    start = time.perf_counter()
+    html = m.get_root().render()
+    rendered = time.perf_counter() - start
+    return f'{built:6.2f} s + {rendered:6.2f} s, {len(html.encode()) / 2**20:5.1f} MB'
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('sizes', nargs='*', type=size_arg, default=[1_000, 10_000, 100_000])
+    parser.add_argument('--per-marker-max', type=size_arg, default=10_000)
+    args = parser.parse_args()
+
+    app = load_app()
+    listings = shipped_listings(app)
+    print(f"{'rows':>8}  {'per-marker: build + render, HTML':<34}  bulk: build + render, HTML")
+    for size in args.sizes:
+        tiled = tiled_listings(app, listings, size)
+        per_marker = measure(per_marker_map, app, tiled) if size <= args.per_marker_max else '(not run)'
+        print(f'{size:>8,}  {per_marker:<34}  {measure(bulk_map, app, tiled)}')
+
+
+if __name__ == '__main__':
+    main()
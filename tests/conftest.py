@@ -0,0 +1,47 @@
+import ast
+import logging
+import os
+import sys
+import types
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+APP_PATH = os.path.join(ROOT, 'App.py')
+
+
+def load_app_definitions():
+    """Import App.py without running the page.
+
+    App.py is a Streamlit script, so importing it would draw the whole app.
+    Only its imports, functions, classes and module constants (UPPER_CASE or
+    _private names) are executed.
+    """
+    tree = ast.parse(open(APP_PATH, encoding='utf-8').read())
+    body = []
+    for node in tree.body:
+        if isinstance(node, (ast.Import, ast.ImportFrom, ast.FunctionDef, ast.ClassDef)):
+            body.append(node)
+        elif isinstance(node, ast.Try) and all(isinstance(n, (ast.Import, ast.ImportFrom)) for n in node.body):
+            body.append(node)
+        elif isinstance(node, (ast.Assign, ast.AnnAssign)):
+            targets = node.targets if isinstance(node, ast.Assign) else [node.target]
+            if all(isinstance(t, ast.Name) and (t.id.isupper() or t.id.startswith('_')) for t in targets):
+                body.append(node)
+    module = types.ModuleType('app')
+    module.__file__ = APP_PATH
+    sys.modules['app'] = module
+    exec(compile(ast.Module(body=body, type_ignores=[]), APP_PATH, 'exec'), module.__dict__)
+    return module
+
+
+@pytest.fixture(scope='session')
+def app():
+    # streamlit warns about the missing script context on every cached call
+    logging.getLogger('streamlit').setLevel(logging.ERROR)
+    return load_app_definitions()
+
+
+@pytest.fixture
+def data_file():
+    return os.path.join(ROOT, 'unegui_data.csv')
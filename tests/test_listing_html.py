@@ -0,0 +1,33 @@
+"""Listing popups and cards must not pass scraped markup through."""
+import pandas as pd
+import pytest
+
+SCRAPED = {
+    'title': '<script>alert(1)</script>',
+    'link': "https://www.unegui.mn/adv/1' onmouseover='alert(1)",
+    'location': '<b>Хан-Уул</b>',
+    'description': '<img src=x onerror=alert(1)> сайхан байр, шинэ засвартай',
+    'date': '<i>12:00</i>',
+    'views': '<u>13</u>',
+}
+
+
+@pytest.fixture
+def row(app, data_file):
+    app.st.session_state.language = 'mn'
+    raw = pd.read_csv(data_file)
+    listing = app.finalize_listings(app.process_listings(raw, extractions=app.new_extraction_cache())).iloc[0].copy()
+    for name, value in SCRAPED.items():
+        listing[name] = value
+    return listing
+
+
+@pytest.mark.parametrize('render', ['listing_popup_html', 'property_card_html'])
+def test_scraped_text_is_escaped(app, row, render):
+    page = getattr(app, render)(row)
+    assert '<script>' not in page
+    assert '<img src=x' not in page
+    assert '<b>' not in page and '<i>' not in page and '<u>' not in page
+    # the quote cannot close the href attribute
+    assert "1' onmouseover" not in page
+    assert '&lt;script&gt;' in page
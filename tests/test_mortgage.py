@@ -0,0 +1,31 @@
+"""Mortgage scenario grid."""
+import pytest
+
+
+@pytest.fixture
+def sweep_cache(app):
+    return app.new_lru_cache(app.SWEEP_CACHE_ENTRIES, app.SWEEP_CACHE_BYTES)
+
+
+def test_sweep_shape(app, sweep_cache):
+    sweep = app.cached_mortgage_sweep(sweep_cache, 300e6, (4.0, 16.0, 25), (10.0, 50.0, 9), (1e6, 5e6, 5))
+    assert sweep['months'].shape == (25, 9, 5)
+    table = app.sweep_table(sweep, 2)
+    assert table.data.shape == (25, 9)
+    table.to_html()
+
+
+@pytest.mark.parametrize('rates, downs, budgets, shape', [
+    ((4.0, 4.0, 25), (10.0, 50.0, 9), (1e6, 5e6, 5), (1, 9, 5)),
+    ((4.0, 16.0, 25), (20.0, 20.0, 9), (1e6, 5e6, 5), (25, 1, 5)),
+    ((4.0, 16.0, 25), (10.0, 50.0, 9), (3e6, 3e6, 5), (25, 9, 1)),
+    ((0.0, 0.0, 2), (0.0, 0.0, 2), (1e6, 1e6, 2), (1, 1, 1)),
+])
+def test_sweep_with_equal_range_ends(app, sweep_cache, rates, downs, budgets, shape):
+    sweep = app.cached_mortgage_sweep(sweep_cache, 300e6, rates, downs, budgets)
+    assert sweep['months'].shape == shape
+    table = app.sweep_table(sweep, shape[2] - 1)
+    assert table.index.is_unique and table.columns.is_unique
+    table.to_html()
+    budget_labels = [f"₮{budget:,.0f}" for budget in sweep['budgets']]
+    assert len(set(budget_labels)) == len(budget_labels)
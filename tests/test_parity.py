@@ -0,0 +1,224 @@
+"""process_listings against the row-wise parser it replaced."""
+import re
+
+import numpy as np
+import pandas as pd
+import pytest
+
+
+# The iterrows parser from before process_listings, kept as the reference.
+# Two things were dropped on purpose: the marker coordinates (now seeded by
+# listing id, not by row) and the dedup, which moved to finalize_listings.
+
+def reference_clean_date(val):
+    if val is None or val == 'nan' or pd.isna(val):
+        return ''
+    s = str(val)
+    for w in ['Өнөөдөр', 'өнөөдөр', 'unuudur', 'unuudur']:
+        s = s.replace(w, '')
+    return s.strip()
+
+
+def reference_district(location):
+    districts = {
+        'Сүхбаатар': 'Sukhbaatar', 'Sukhbaatar': 'Sukhbaatar', 'СХД': 'Sukhbaatar',
+        'Хан-Уул': 'Khan-Uul', 'Khan-Uul': 'Khan-Uul', 'ХУД': 'Khan-Uul',
+        'Чингэлтэй': 'Chingeltei', 'Chingeltei': 'Chingeltei', 'ЧД': 'Chingeltei',
+        'Баянзүрх': 'Bayanzurkh', 'Bayanzurkh': 'Bayanzurkh', 'БЗД': 'Bayanzurkh',
+        'Сонгинохайрхан': 'Songino Khairkhan', 'Songino Khairkhan': 'Songino Khairkhan',
+        'Баянгол': 'Bayangol', 'Bayangol': 'Bayangol', 'БГД': 'Bayangol'
+    }
+    for key, value in districts.items():
+        if key in location:
+            return value
+    return 'Unknown'
+
+
+def reference_format_price(price):
+    if price >= 1_000_000_000:
+        return f"₮{price/1_000_000_000:.1f} тэрбум"
+    elif price >= 1_000_000:
+        return f"₮{price/1_000_000:.0f} сая"
+    else:
+        return f"₮{price:,.0f}"
+
+
+def reference_listings(df):
+    processed = []
+
+    for idx, row in df.iterrows():
+        try:
+            area_str = str(row.get('Area', ''))
+            area_match = re.findall(r'[\d.]+', area_str)
+            area = float(area_match[0]) if area_match else 0
+            if area == 0 or area > 1000:
+                continue
+
+            price_str = str(row.get('Price', '') or row.get('Price(0)', ''))
+            price_matches = re.findall(r'[\d,]+', price_str)
+            if price_matches:
+                prices = [int(p.replace(',', '')) for p in price_matches]
+                price = min(prices)
+                if 'тэрбум' in price_str.lower() or 'тэрбүм' in price_str.lower():
+                    if price < 100:
+                        price *= 1_000_000_000
+                elif price < 1000:
+                    price *= 1_000_000
+            else:
+                price = 0
+
+            if price <= 10_000_000:
+                price *= area
+            elif 10_000_000 < price < 20_000_000:
+                continue
+
+            image_str = str(row.get('images', '') or row.get('Image', ''))
+            image_match = re.findall(r'https?://[^\s"\']+', image_str)
+            image_url = image_match[0] if image_match else ''
+            if image_url:
+                image_url = image_url.split()[0].rstrip(',;')
+
+            location = str(row.get('Location', '') or row.get('Place', '') or row.get('Location Detail', ''))
+            district = reference_district(location)
+
+            balcony = str(row.get('Balcony', '')).strip()
+            balcony_count = None
+            if balcony:
+                nums = re.findall(r'\d+', balcony)
+                if nums:
+                    try:
+                        balcony_count = int(nums[0])
+                    except ValueError:
+                        balcony_count = None
+                else:
+                    bl = balcony.lower()
+                    if 'тагтгүй' in bl or 'тагт гүй' in bl or 'no' in bl:
+                        balcony_count = 0
+
+            if price > 0:
+                processed.append({
+                    'row_number': idx,
+                    'title': str(row.get('Title', '') or row.get('Title(0)', 'Property')),
+                    'price': price,
+                    'price_formatted': reference_format_price(price),
+                    'location': location,
+                    'district': district,
+                    'area': area,
+                    'floor': str(row.get('Floor Number', '')),
+                    'building_floor': str(row.get('Building Floor', '')),
+                    'year': str(row.get('Commissioning Year', '')).strip(),
+                    'balcony': balcony,
+                    'balcony_count': balcony_count,
+                    'elevator': str(row.get('Elevator', '')).strip(),
+                    'garage': str(row.get('Garage', '')).strip(),
+                    'window_count': str(row.get('Window Count', '') or row.get('Window', '')).strip(),
+                    'door': str(row.get('Door Type', '') or row.get('Door', '')).strip(),
+                    'floor_type': str(row.get('Floor Type', '') or row.get('Floor_Type', '') or row.get('Floor', '')).strip(),
+                    'rooms': str(row.get('Room Count', '') or row.get('Rooms', '')).strip(),
+                    'description': str(row.get('Description', ''))[:300],
+                    'date': reference_clean_date(str(row.get('Published Date', '') or row.get('Date', ''))),
+                    'views': str(row.get('View Count', '')),
+                    'image_url': image_url,
+                    'link': str(row.get('Title link', '') or row.get('Link', '')),
+                })
+        except Exception:
+            continue
+
+    return pd.DataFrame(processed)
+
+
+def assert_parity(app, raw, skip=(), reference_raw=None):
+    expected = reference_listings(raw if reference_raw is None else reference_raw)
+    expected = expected.drop(columns=list(skip))
+    result = app.process_listings(raw.copy(), extractions=app.new_extraction_cache())
+    result = result[result['row_number'].isin(expected['row_number'])]
+    pd.testing.assert_frame_equal(
+        result[expected.columns].reset_index(drop=True),
+        expected.astype({'row_number': 'int64', 'price': 'float64', 'balcony_count': 'float64'}),
+        check_dtype=False
+    )
+    return expected, result
+
+
+def edge_rows(**columns):
+    base = {
+        'Title': 'Орон сууц',
+        'Area': '60 м²',
+        'Price': '300 сая ₮',
+        'Location': 'Улаанбаатар, Хан-Уул, 11-р хороо',
+        'Balcony': '1 тагттай',
+        'Published Date': 'Өнөөдөр 12:00',
+        'Floor Number': '5',
+        'Building Floor': '12',
+        'Commissioning Year': '2015',
+    }
+    n = max(len(v) for v in columns.values())
+    return pd.DataFrame({name: columns.get(name, [value] * n) for name, value in base.items()})
+
+
+# the shipped scrape's names for columns the old parser looked up under another name
+SCRAPE_COLUMN_NAMES = {
+    'Floor_Number': 'Floor Number', 'Building_Floor': 'Building Floor', 'Year': 'Commissioning Year',
+    'Window_Count': 'Window Count', 'View_Count': 'View Count', 'Title_Link': 'Title link',
+}
+
+
+def test_shipped_csv(app, data_file):
+    raw = pd.read_csv(data_file)
+    # the old parser gets the scrape's columns under the names it looked for;
+    # floor, building floor and year are left out because process_listings
+    # also fills them from the description (the edge rows cover them)
+    reference_raw = raw.rename(columns=SCRAPE_COLUMN_NAMES)
+    expected, result = assert_parity(app, raw, skip=['floor', 'building_floor', 'year', 'window_count', 'views'],
+                                     reference_raw=reference_raw)
+    assert len(expected) > 300
+    # whole numbers lose the scrape's '.0' and view counts its 'Үзсэн :' label
+    reference = reference_listings(reference_raw)
+    assert list(result['window_count']) == list(reference['window_count'].str.replace(r'\.0$', '', regex=True))
+    assert list(result['views']) == list(reference['views'].str.replace('Үзсэн : ', '', regex=False))
+    # the only listings the old parser dropped and process_listings keeps are
+    # those whose price came from the description
+    rescued = ~app.process_listings(raw.copy())['row_number'].isin(expected['row_number'])
+    assert rescued.sum() <= 5
+
+
+def test_price_units(app):
+    raw = edge_rows(Price=[
+        '5 сая ₮', '250 сая', '2 Тэрбум', '1.15 Тэрбум ₮ 1.25 Тэрбум ₮', '2 ТЭРБҮМ',
+        '150 тэрбум', '1,064,200,000₮', '3,500,000 ₮', '15 сая ₮', '25,000,000',
+    ])
+    expected, result = assert_parity(app, raw)
+    # 15 сая is in the dropped 10M-20M band
+    assert list(expected['row_number']) == [0, 1, 2, 3, 4, 5, 6, 7, 9]
+    assert expected['price'].iloc[0] == 5_000_000 * 60
+    assert expected['price'].iloc[2] == 2_000_000_000
+
+
+@pytest.mark.parametrize('price', ['', np.nan, ',', 'Үнэ тохиролцоно'])
+def test_missing_price(app, price):
+    raw = edge_rows(Price=[price, '300 сая ₮'])
+    expected, result = assert_parity(app, raw)
+    assert list(expected['row_number']) == [1]
+
+
+def test_unparseable_date(app):
+    raw = edge_rows(**{'Published Date': ['Өнөөдөр 12:00', 'unuudur', np.nan, ' x ', '', '2024-13-45']})
+    expected, result = assert_parity(app, raw)
+    assert list(expected['date']) == ['12:00', '', '', 'x', '', '2024-13-45']
+
+
+def test_area(app):
+    raw = edge_rows(Area=['55 м²', '.', '1.2.3', '0', '1001', '12.5', 'abc', np.nan, '1000'])
+    expected, result = assert_parity(app, raw)
+    assert list(expected['area']) == [55.0, 12.5, 1000.0]
+
+
+def test_balcony(app):
+    raw = edge_rows(Balcony=['no', 'Тагтгүй', 'тагт гүй', np.nan, '3+ тагттай', '', 'yes', '2 тагт'])
+    expected, result = assert_parity(app, raw)
+    assert list(expected['balcony_count'].fillna(-1)) == [0, 0, 0, -1, 3, -1, -1, 2]
+
+
+def test_empty_frame(app, data_file):
+    raw = pd.read_csv(data_file).iloc[0:0]
+    assert len(app.process_listings(raw, extractions=app.new_extraction_cache())) == 0
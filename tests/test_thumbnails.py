@@ -0,0 +1,227 @@
+"""Thumbnail fetching and caching against a local stub photo server."""
+import collections
+import http.server
+import io
+import os
+import threading
+import time
+
+import pytest
+from PIL import Image
+
+
+def photo(color, size=(800, 600)):
+    out = io.BytesIO()
+    Image.new('RGB', size, color).save(out, 'JPEG')
+    return out.getvalue()
+
+
+PHOTOS = {
+    '/red.jpg': photo('red'),
+    '/green.jpg': photo('green'),
+    '/blue.jpg': photo('blue'),
+    '/wide.jpg': photo('white', (1600, 400)),
+}
+SLOW_SECONDS = 2
+
+
+@pytest.fixture
+def server():
+    """Serves PHOTOS, answers /slow.jpg after SLOW_SECONDS and 404s the rest;
+    counts requests per path"""
+    hits = collections.Counter()
+
+    class Handler(http.server.BaseHTTPRequestHandler):
+        def do_GET(self):
+            hits[self.path] += 1
+            if self.path == '/slow.jpg':
+                time.sleep(SLOW_SECONDS)
+            body = PHOTOS.get(self.path)
+            if body is None and self.path == '/slow.jpg':
+                body = PHOTOS['/red.jpg']
+            if body is None:
+                self.send_error(404)
+                return
+            self.send_response(200)
+            self.send_header('Content-Type', 'image/jpeg')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    httpd = http.server.ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    httpd.daemon_threads = True
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    base = f'http://127.0.0.1:{httpd.server_address[1]}'
+    yield base, hits
+    httpd.shutdown()
+    httpd.server_close()
+
+
+@pytest.fixture
+def new_store(app, tmp_path):
+    stores = []
+
+    def make(**options):
+        options.setdefault('timeout', 0.5)
+        store = app.new_thumbnail_store(str(tmp_path / 'thumbs'), **options)
+        stores.append(store)
+        return store
+
+    yield make
+    for store in stores:
+        store['executor'].shutdown(wait=True)
+
+
+def wait_idle(store, deadline=10):
+    end = time.time() + deadline
+    while time.time() < end:
+        with store['lock']:
+            if not store['pending']:
+                return
+        time.sleep(0.01)
+    raise AssertionError('thumbnail fetches did not finish')
+
+
+def fetch(app, store, urls):
+    app.request_thumbnails(store, urls)
+    wait_idle(store)
+
+
+def test_fetch_and_embed(app, server, new_store):
+    base, hits = server
+    store = new_store()
+    url = f'{base}/wide.jpg'
+    assert app.thumbnail_src(store, url) == (url, False)
+    fetch(app, store, [url])
+
+    src, pending = app.thumbnail_src(store, url)
+    assert src.startswith('data:image/webp;base64,')
+    assert not pending
+    digest = app.lru_lookup(store['index'], url)
+    with Image.open(app._thumbnail_path(store, digest)) as thumbnail:
+        assert thumbnail.format == 'WEBP'
+        # fits THUMB_SIZE, keeping the 4:1 aspect ratio
+        assert thumbnail.size == (app.THUMB_SIZE[0], app.THUMB_SIZE[0] // 4)
+
+
+def test_queued_photo_points_at_the_source(app, server, new_store):
+    base, hits = server
+    store = new_store(timeout=SLOW_SECONDS * 2)
+    url = f'{base}/slow.jpg'
+    app.request_thumbnails(store, [url])
+    assert app.thumbnail_src(store, url) == (url, True)
+    wait_idle(store)
+    assert app.thumbnail_src(store, url)[0].startswith('data:image/webp')
+
+
+def test_repeated_urls_are_fetched_once(app, server, new_store):
+    base, hits = server
+    store = new_store()
+    url = f'{base}/red.jpg'
+    app.request_thumbnails(store, [url, url, url])
+    app.request_thumbnails(store, [url])
+    wait_idle(store)
+    fetch(app, store, [url, url])
+    assert hits['/red.jpg'] == 1
+    assert app.thumbnail_src(store, url)[0].startswith('data:image/webp')
+
+
+def test_same_photo_at_two_urls_is_stored_once(app, server, new_store):
+    base, hits = server
+    store = new_store()
+    fetch(app, store, [f'{base}/red.jpg', f'{base}/red.jpg?size=large'])
+    assert len(store['refs']) == 1
+    assert len([name for name in os.listdir(store['dir']) if name.endswith('.webp')]) == 1
+
+
+@pytest.mark.parametrize('path', ['/missing.jpg', '/slow.jpg'])
+def test_failed_fetch_falls_back_to_the_source(app, server, new_store, path):
+    base, hits = server
+    store = new_store()
+    url = f'{base}{path}'
+    fetch(app, store, [url])
+    assert app.thumbnail_src(store, url) == (url, False)
+    assert url in store['failed']['entries']
+    # not retried before THUMB_RETRY_SECONDS
+    fetch(app, store, [url])
+    assert hits[path] == 1
+    assert not store['refs']
+
+
+def test_failed_fetch_is_retried_after_the_retry_delay(app, server, new_store, monkeypatch):
+    base, hits = server
+    store = new_store()
+    url = f'{base}/missing.jpg'
+    fetch(app, store, [url])
+    monkeypatch.setattr(app, 'THUMB_RETRY_SECONDS', 0)
+    # the photo has appeared since
+    PHOTOS['/missing.jpg'] = PHOTOS['/red.jpg']
+    try:
+        fetch(app, store, [url])
+    finally:
+        del PHOTOS['/missing.jpg']
+    assert hits['/missing.jpg'] == 2
+    assert app.thumbnail_src(store, url)[0].startswith('data:image/webp')
+    assert url not in store['failed']['entries']
+
+
+def test_failed_urls_are_bounded(app, server, new_store):
+    base, hits = server
+    store = new_store(failed_entries=3)
+    urls = [f'{base}/missing-{i}.jpg' for i in range(5)]
+    for url in urls:
+        fetch(app, store, [url])
+    assert list(store['failed']['entries']) == urls[2:]
+    # the oldest failures were forgotten, so they are tried again
+    fetch(app, store, urls[:1])
+    assert hits['/missing-0.jpg'] == 2
+
+
+def test_eviction_at_the_byte_budget(app, server, new_store):
+    base, hits = server
+    sizes = {path: len(app.make_thumbnail(PHOTOS[path])) for path in ['/red.jpg', '/green.jpg', '/blue.jpg']}
+    # room for any two of the three thumbnails, not for all three
+    budget = 2 * max(sizes.values())
+    assert sum(sizes.values()) > budget
+    store = new_store(max_bytes=budget)
+    red, green, blue = (f'{base}/{name}.jpg' for name in ['red', 'green', 'blue'])
+    fetch(app, store, [red])
+    fetch(app, store, [green])
+    red_digest = store['index']['entries'][red][0]
+    fetch(app, store, [blue])
+
+    # red was stored before green, so it goes first
+    assert app.thumbnail_src(store, red) == (red, False)
+    assert app.thumbnail_src(store, green)[0].startswith('data:image/webp')
+    assert app.thumbnail_src(store, blue)[0].startswith('data:image/webp')
+    assert store['index']['bytes'] <= store['index']['max_bytes']
+    assert not os.path.exists(app._thumbnail_path(store, red_digest))
+    assert not os.path.exists(app._thumbnail_ref_path(store, red))
+
+
+def test_thumbnails_survive_a_restart(app, server, new_store):
+    base, hits = server
+    url = f'{base}/green.jpg'
+    fetch(app, new_store(), [url])
+    store = new_store()
+    assert app.thumbnail_src(store, url)[0].startswith('data:image/webp')
+    fetch(app, store, [url])
+    assert hits['/green.jpg'] == 1
+
+
+def test_recently_shown_thumbnail_is_kept(app, server, new_store):
+    base, hits = server
+    sizes = [len(app.make_thumbnail(PHOTOS[path])) for path in ['/red.jpg', '/green.jpg', '/blue.jpg']]
+    store = new_store(max_bytes=2 * max(sizes))
+    red, green, blue = (f'{base}/{name}.jpg' for name in ['red', 'green', 'blue'])
+    fetch(app, store, [red])
+    fetch(app, store, [green])
+    # showing red makes green the least recently used
+    app.thumbnail_src(store, red)
+    fetch(app, store, [blue])
+    assert app.thumbnail_src(store, red)[0].startswith('data:image/webp')
+    assert app.thumbnail_src(store, green) == (green, False)